@@ -2,6 +2,12 @@
 import requests
 from pyrevit import forms
 import traceback
+import json
+import time
+
+# Longest a single read may stall, and the cap on the whole request
+READ_TIMEOUT = 30
+TOTAL_TIMEOUT = 120
 
 # Ask for a string input
 query = forms.ask_for_string(
@@ -12,8 +18,12 @@ query = forms.ask_for_string(
 
 
 def get_code(query):
-    response = requests.get(
-        "http://localhost:5000/generate_code?input=" + query.replace(" ", "%20")
+    deadline = time.time() + TOTAL_TIMEOUT
+    response = requests.post(
+        "http://localhost:5000/generate_code",
+        json={"input": query, "stream": True},
+        stream=True,
+        timeout=READ_TIMEOUT,
     )
     print(response)
     # When there is an error
@@ -24,10 +34,34 @@ def get_code(query):
         )
         return
 
-    # Otherwise return the code
-    data = response.json()
-    code = data["code"]
-    return code
+    # Demo mode still answers with a single JSON body
+    if not response.headers.get("Content-Type", "").startswith("text/event-stream"):
+        data = response.json()
+        return data["code"]
+
+    # Otherwise print the code line by line as it is generated, until the
+    # server sends the finished (cleaned) code
+    pending = ""
+    for line in response.iter_lines(decode_unicode=True):
+        if time.time() > deadline:
+            response.close()
+            forms.alert("The coding sweatshop took longer than "
+                        + str(TOTAL_TIMEOUT) + " seconds, giving up.")
+            return
+        if not line or not line.startswith("data: "):
+            continue
+        event = json.loads(line[len("data: "):])
+        if "error" in event:
+            forms.alert("The coding sweatshop failed:\n" + event["error"])
+            return
+        if event.get("done"):
+            if pending:
+                print(pending)
+            return event["code"]
+        pending += event.get("t", "")
+        while "\n" in pending:
+            done_line, pending = pending.split("\n", 1)
+            print(done_line)
 
 
 if query:
@@ -2,12 +2,18 @@
 # pyRevit script: apply a chosen view template to elevation views
 # referenced by selected elevation markers (or selected elevation views).
 
+import math
+
 from pyrevit import revit, DB, forms, script
+from System.Collections.Generic import List
 
 doc = revit.doc
 uidoc = revit.uidoc
 output = script.get_output()
 
+# Plan cell size (ft) for the floor/ceiling bbox grid.
+_GRID_CELL_FT = 50.0
+
 
 def _is_elev_view(v):
     try:
@@ -17,21 +23,22 @@ def _is_elev_view(v):
 
 
 def _pick_view_template():
-    all_views = DB.FilteredElementCollector(doc).OfClass(DB.View).ToElements()
-    templates = [v for v in all_views if v.IsTemplate]
-    if not templates:
-        forms.alert("No view templates found in this project.", exitscript=True)
-        return None
-
     display = []
     map_back = {}
-    for v in templates:
+    for v in DB.FilteredElementCollector(doc).OfClass(DB.View):
+        if not v.IsTemplate:
+            continue
         name = u"{}  ({})".format(v.Name, str(v.ViewType))
         display.append(name)
         map_back[name] = v
 
+    if not display:
+        forms.alert("No view templates found in this project.", exitscript=True)
+        return None
+
+    display.sort()
     chosen = forms.SelectFromList.show(
-        sorted(display),
+        display,
         multiselect=False,
         title="Pick a View Template",
         button_name="Use Template"
@@ -41,121 +48,277 @@ def _pick_view_template():
     return map_back[chosen]
 
 
-def _transform_bbox_to_view_local(bb_model, inv_t):
-    pts = []
-    try:
-        mn = bb_model.Min
-        mx = bb_model.Max
-        corners = [
-            DB.XYZ(mn.X, mn.Y, mn.Z),
-            DB.XYZ(mn.X, mn.Y, mx.Z),
-            DB.XYZ(mn.X, mx.Y, mn.Z),
-            DB.XYZ(mn.X, mx.Y, mx.Z),
-            DB.XYZ(mx.X, mn.Y, mn.Z),
-            DB.XYZ(mx.X, mn.Y, mx.Z),
-            DB.XYZ(mx.X, mx.Y, mn.Z),
-            DB.XYZ(mx.X, mx.Y, mx.Z),
-        ]
-        for p in corners:
-            pts.append(inv_t.OfPoint(p))
-    except Exception:
+def _collect_floors_and_ceilings():
+    # One model pass for both categories, split into plain Python lists so each
+    # view's loop doesn't re-enumerate the .NET collection.
+    cats = List[DB.BuiltInCategory]([DB.BuiltInCategory.OST_Floors,
+                                     DB.BuiltInCategory.OST_Ceilings])
+    floor_cat_id = int(DB.BuiltInCategory.OST_Floors)
+    floors = []
+    ceilings = []
+    for el in DB.FilteredElementCollector(doc)\
+            .WherePasses(DB.ElementMulticategoryFilter(cats))\
+            .WhereElementIsNotElementType():
+        if el.Category.Id.IntegerValue == floor_cat_id:
+            floors.append(el)
+        else:
+            ceilings.append(el)
+    return floors, ceilings
+
+
+def _cached_bbox(el, cache):
+    # Model bboxes don't change while we process views; fetch each one once
+    # and keep it as plain floats (min x/y/z, max x/y/z) so the per-view
+    # loops never go back through .NET properties.
+    key = el.Id.IntegerValue
+    if key not in cache:
+        bb = el.get_BoundingBox(None)
+        if bb:
+            mn = bb.Min
+            mx = bb.Max
+            cache[key] = (mn.X, mn.Y, mn.Z, mx.X, mx.Y, mx.Z)
+        else:
+            cache[key] = None
+    return cache[key]
+
+
+def _cell_range(lo, hi):
+    return range(int(math.floor(lo / _GRID_CELL_FT)), int(math.floor(hi / _GRID_CELL_FT)) + 1)
+
+
+def _build_bbox_grid(elements, cache):
+    # Bucket model bboxes into plan cells once so each view only visits
+    # elements near its crop region.
+    entries = []
+    cells = {}
+    # Overall extent of the category, so views that can't reach any of it
+    # skip the cell walk entirely.
+    extent = [float("inf")] * 3 + [float("-inf")] * 3
+    # Largest bbox half-size per world axis, used to keep the world-space
+    # crop bounds conservative (see _world_crop_bounds).
+    half = [0.0] * 3
+    for el in elements:
+        bb = _cached_bbox(el, cache)
+        if bb is None:
+            continue
+        entry = (len(entries), bb)
+        entries.append(entry)
+        for i in range(3):
+            extent[i] = min(extent[i], bb[i])
+            extent[i + 3] = max(extent[i + 3], bb[i + 3])
+            half[i] = max(half[i], (bb[i + 3] - bb[i]) / 2.0)
+        for ix in _cell_range(bb[0], bb[3]):
+            for iy in _cell_range(bb[1], bb[4]):
+                cells.setdefault((ix, iy), []).append(entry)
+    return entries, cells, extent, half
+
+
+def _query_bbox_grid(grid, lo, hi):
+    entries, cells, extent, _ = grid
+    for i in range(3):
+        if hi[i] < extent[i] or lo[i] > extent[i + 3]:
+            return []
+    if any(math.isinf(v) for v in (lo[0], lo[1], hi[0], hi[1])):
+        return entries
+    x_range = _cell_range(lo[0], hi[0])
+    y_range = _cell_range(lo[1], hi[1])
+    if len(x_range) * len(y_range) > len(cells):
+        return entries
+    seen = set()
+    found = []
+    for ix in x_range:
+        for iy in y_range:
+            for entry in cells.get((ix, iy), ()):
+                if entry[0] not in seen:
+                    seen.add(entry[0])
+                    found.append(entry)
+    found.sort()
+    return found
+
+
+def _transform_rows(t):
+    # The transform as plain float rows: out_i = origin_i + row_i . point.
+    o, bx, by, bz = t.Origin, t.BasisX, t.BasisY, t.BasisZ
+    return ((o.X, bx.X, by.X, bz.X),
+            (o.Y, bx.Y, by.Y, bz.Y),
+            (o.Z, bx.Z, by.Z, bz.Z))
+
+
+def _transform_bbox_to_view_local(bb, rows):
+    # Bounds of the 8 transformed corners, built per axis from the smaller and
+    # larger of each term. Same result as transforming every corner, without
+    # creating a DB.XYZ or calling OfPoint.
+    mn_x, mn_y, mn_z, mx_x, mx_y, mx_z = bb
+    lo = []
+    hi = []
+    for o, a, b, c in rows:
+        ax0, ax1 = a * mn_x, a * mx_x
+        by0, by1 = b * mn_y, b * mx_y
+        cz0, cz1 = c * mn_z, c * mx_z
+        lo.append(o + min(ax0, ax1) + min(by0, by1) + min(cz0, cz1))
+        hi.append(o + max(ax0, ax1) + max(by0, by1) + max(cz0, cz1))
+    return lo[0], lo[1], lo[2], hi[0], hi[1], hi[2]
+
+
+def _upright_frame(t):
+    # Plain elevations/sections have world Z as their up axis, so the inverse
+    # transform is just a rotation in plan plus a vertical offset.
+    if abs(t.BasisY.Z - 1.0) > 1e-9:
         return None
-
-    vmin = DB.XYZ(min(p.X for p in pts), min(p.Y for p in pts), min(p.Z for p in pts))
-    vmax = DB.XYZ(max(p.X for p in pts), max(p.Y for p in pts), max(p.Z for p in pts))
-    return vmin, vmax
-
-
-def _auto_fit_view_to_floor_and_ceiling(view, floors, ceilings, pad_ft=0.10):
+    o = t.Origin
+    return (o.X, o.Y, o.Z, t.BasisX.X, t.BasisX.Y, t.BasisZ.X, t.BasisZ.Y)
+
+
+def _upright_bbox_to_view_local(bb, frame):
+    mn_x, mn_y, mn_z, mx_x, mx_y, mx_z = bb
+    ox, oy, oz, xx, xy, zx, zy = frame
+    xs = []
+    zs = []
+    for wx in (mn_x - ox, mx_x - ox):
+        for wy in (mn_y - oy, mx_y - oy):
+            xs.append(xx * wx + xy * wy)
+            zs.append(zx * wx + zy * wy)
+    return min(xs), mn_z - oz, min(zs), max(xs), mx_z - oz, max(zs)
+
+
+def _world_crop_bounds(t, cmn_x, cmn_z, cmx_x, cmx_z, half):
+    # World-space AABB of the crop's view-local X/Z footprint. View-local Y is
+    # left unbounded to match the X/Z-only overlap test in the fit below.
+    # The view-local test compares each element's rotated (inflated) bbox, so
+    # the footprint is first grown by the most any element in the grid can
+    # spread along view X/Z: its largest half-size projected onto each axis.
+    # Any element that test accepts then has its centre inside these bounds,
+    # so pruning with them never drops it, in rotated views too.
+    bx, bz = t.BasisX, t.BasisZ
+    grow_x = abs(bx.X) * half[0] + abs(bx.Y) * half[1] + abs(bx.Z) * half[2] + 1e-6
+    grow_z = abs(bz.X) * half[0] + abs(bz.Y) * half[1] + abs(bz.Z) * half[2] + 1e-6
+    lo = [float("inf")] * 3
+    hi = [float("-inf")] * 3
+    for x in (cmn_x - grow_x, cmx_x + grow_x):
+        for z in (cmn_z - grow_z, cmx_z + grow_z):
+            p = t.OfPoint(DB.XYZ(x, 0.0, z))
+            for i, v in enumerate((p.X, p.Y, p.Z)):
+                lo[i] = min(lo[i], v)
+                hi[i] = max(hi[i], v)
+    by = t.BasisY
+    for i, v in enumerate((by.X, by.Y, by.Z)):
+        if abs(v) > 1e-9:
+            lo[i] = float("-inf")
+            hi[i] = float("inf")
+    return lo, hi
+
+
+def _fit_candidate(key, y, sum_x, sum_z, center_x, center_z):
+    # Squared distance ranks the same as the true distance without the sqrt.
+    dx = sum_x / 2.0 - center_x
+    dz = sum_z / 2.0 - center_z
+    return {
+        key: y,
+        "dist_sq": dx * dx + dz * dz,
+    }
+
+
+def _auto_fit_view_to_floor_and_ceiling(view, floor_grid, ceil_grid, pad_ft=0.10):
     cb = view.CropBox
     if cb is None:
         return False
 
     try:
-        view.CropBoxActive = True
+        if not view.CropBoxActive:
+            view.CropBoxActive = True
     except Exception:
         pass
 
-    inv_t = cb.Transform.Inverse
+    # Each CropBox.Transform read hands back a fresh copy; fetch it (and its
+    # inverse) once per view and share it with the helpers below.
+    t = cb.Transform
+    inv_rows = _transform_rows(t.Inverse)
+    frame = _upright_frame(t)
     crop_min = cb.Min
     crop_max = cb.Max
+    # Plain floats from here on; .NET property reads are slow in the loops.
+    cmn_x, cmn_y, cmn_z = crop_min.X, crop_min.Y, crop_min.Z
+    cmx_x, cmx_y, cmx_z = crop_max.X, crop_max.Y, crop_max.Z
 
     # For elevation/section views, view-local Y is the vertical axis.
     max_thickness_ft = 5.0
-    center_x = (crop_min.X + crop_max.X) / 2.0
-    center_z = (crop_min.Z + crop_max.Z) / 2.0
-    all_floor_cands = []
-    all_ceil_cands = []
-
-    for f in floors:
-        bb = f.get_BoundingBox(None)
-        vbb = _transform_bbox_to_view_local(bb, inv_t) if bb else None
-        if not vbb:
+    center_x = (cmn_x + cmx_x) / 2.0
+    center_z = (cmn_z + cmx_z) / 2.0
+    floor_cands = []
+    ceil_cands = []
+    thick_floors = []
+    thick_ceils = []
+
+    w_lo, w_hi = _world_crop_bounds(t, cmn_x, cmn_z, cmx_x, cmx_z, floor_grid[3])
+    wlo_x, wlo_y, wlo_z = w_lo
+    whi_x, whi_y, whi_z = w_hi
+    for _, bb in _query_bbox_grid(floor_grid, w_lo, w_hi):
+        # Cheap world-space reject before the view-local transform.
+        if bb[3] < wlo_x or bb[0] > whi_x or bb[4] < wlo_y or bb[1] > whi_y \
+                or bb[5] < wlo_z or bb[2] > whi_z:
             continue
-        vmin, vmax = vbb
-        if vmax.X < crop_min.X or vmin.X > crop_max.X:
+        if frame is not None:
+            vbb = _upright_bbox_to_view_local(bb, frame)
+        else:
+            vbb = _transform_bbox_to_view_local(bb, inv_rows)
+        vmin_x, vmin_y, vmin_z, vmax_x, vmax_y, vmax_z = vbb
+        if not (vmax_x >= cmn_x and vmin_x <= cmx_x and vmax_z >= cmn_z and vmin_z <= cmx_z):
             continue
-        if vmax.Z < crop_min.Z or vmin.Z > crop_max.Z:
+        if abs(vmax_y - vmin_y) > max_thickness_ft:
+            # Only ranked if nothing thin overlaps; skip the distance math for now.
+            thick_floors.append((vmax_y, vmin_x + vmax_x, vmin_z + vmax_z))
             continue
-        thickness = abs(vmax.Y - vmin.Y)
-        cx = (vmin.X + vmax.X) / 2.0
-        cz = (vmin.Z + vmax.Z) / 2.0
-        dist = ((cx - center_x) ** 2 + (cz - center_z) ** 2) ** 0.5
-        all_floor_cands.append({
-            "top_y": vmax.Y,
-            "dist": dist,
-            "thickness": thickness,
-            "id": f.Id.IntegerValue,
-            "name": f.Name,
-        })
-
-    for c in ceilings:
-        bb = c.get_BoundingBox(None)
-        vbb = _transform_bbox_to_view_local(bb, inv_t) if bb else None
-        if not vbb:
+        floor_cands.append(_fit_candidate(
+            "top_y", vmax_y, vmin_x + vmax_x, vmin_z + vmax_z, center_x, center_z))
+
+    w_lo, w_hi = _world_crop_bounds(t, cmn_x, cmn_z, cmx_x, cmx_z, ceil_grid[3])
+    wlo_x, wlo_y, wlo_z = w_lo
+    whi_x, whi_y, whi_z = w_hi
+    for _, bb in _query_bbox_grid(ceil_grid, w_lo, w_hi):
+        # Cheap world-space reject before the view-local transform.
+        if bb[3] < wlo_x or bb[0] > whi_x or bb[4] < wlo_y or bb[1] > whi_y \
+                or bb[5] < wlo_z or bb[2] > whi_z:
             continue
-        vmin, vmax = vbb
-        if vmax.X < crop_min.X or vmin.X > crop_max.X:
+        if frame is not None:
+            vbb = _upright_bbox_to_view_local(bb, frame)
+        else:
+            vbb = _transform_bbox_to_view_local(bb, inv_rows)
+        vmin_x, vmin_y, vmin_z, vmax_x, vmax_y, vmax_z = vbb
+        if not (vmax_x >= cmn_x and vmin_x <= cmx_x and vmax_z >= cmn_z and vmin_z <= cmx_z):
             continue
-        if vmax.Z < crop_min.Z or vmin.Z > crop_max.Z:
+        if abs(vmax_y - vmin_y) > max_thickness_ft:
+            # Only ranked if nothing thin overlaps; skip the distance math for now.
+            thick_ceils.append((vmin_y, vmin_x + vmax_x, vmin_z + vmax_z))
             continue
-        thickness = abs(vmax.Y - vmin.Y)
-        cx = (vmin.X + vmax.X) / 2.0
-        cz = (vmin.Z + vmax.Z) / 2.0
-        dist = ((cx - center_x) ** 2 + (cz - center_z) ** 2) ** 0.5
-        all_ceil_cands.append({
-            "bot_y": vmin.Y,
-            "dist": dist,
-            "thickness": thickness,
-            "id": c.Id.IntegerValue,
-            "name": c.Name,
-        })
-
-    floor_cands = [c for c in all_floor_cands if c["thickness"] <= max_thickness_ft]
-    ceil_cands = [c for c in all_ceil_cands if c["thickness"] <= max_thickness_ft]
+        ceil_cands.append(_fit_candidate(
+            "bot_y", vmin_y, vmin_x + vmax_x, vmin_z + vmax_z, center_x, center_z))
+
     if not floor_cands:
-        floor_cands = all_floor_cands
+        floor_cands = [_fit_candidate("top_y", y, sx, sz, center_x, center_z)
+                       for y, sx, sz in thick_floors]
     if not ceil_cands:
-        ceil_cands = all_ceil_cands
+        ceil_cands = [_fit_candidate("bot_y", y, sx, sz, center_x, center_z)
+                      for y, sx, sz in thick_ceils]
 
     if not floor_cands and not ceil_cands:
         return False
 
     best_floor = None
     if floor_cands:
-        floor_cands.sort(key=lambda x: (x["dist"], -x["top_y"]))
+        floor_cands.sort(key=lambda x: (x["dist_sq"], -x["top_y"]))
         best_floor = floor_cands[0]
 
     best_ceil = None
     if ceil_cands:
-        ceil_cands.sort(key=lambda x: (x["dist"], x["bot_y"]))
+        ceil_cands.sort(key=lambda x: (x["dist_sq"], x["bot_y"]))
         best_ceil = ceil_cands[0]
-
-    if best_floor and ceil_cands:
-        above = [c for c in ceil_cands if c["bot_y"] > best_floor["top_y"] + 1e-6]
-        if above:
-            above.sort(key=lambda x: (x["dist"], x["bot_y"]))
-            best_ceil = above[0]
+        # Already in preference order, so the first ceiling above the floor wins.
+        if best_floor:
+            floor_top_y = best_floor["top_y"] + 1e-6
+            for c in ceil_cands:
+                if c["bot_y"] > floor_top_y:
+                    best_ceil = c
+                    break
 
     best_floor_y = best_floor["top_y"] if best_floor else None
     best_ceil_y = best_ceil["bot_y"] if best_ceil else None
@@ -165,47 +328,31 @@ def _auto_fit_view_to_floor_and_ceiling(view, floors, ceilings, pad_ft=0.10):
     if best_ceil_y is not None:
         best_ceil_y += pad_ft
 
-    new_min_y = cb.Min.Y if best_floor_y is None else best_floor_y
-    new_max_y = cb.Max.Y if best_ceil_y is None else best_ceil_y
+    new_min_y = cmn_y if best_floor_y is None else best_floor_y
+    new_max_y = cmx_y if best_ceil_y is None else best_ceil_y
 
     if new_max_y <= new_min_y:
         return False
 
-    new_cb = DB.BoundingBoxXYZ()
-    new_cb.Transform = cb.Transform
-    new_cb.Min = DB.XYZ(cb.Min.X, new_min_y, cb.Min.Z)
-    new_cb.Max = DB.XYZ(cb.Max.X, new_max_y, cb.Max.Z)
+    # view.CropBox hands back a copy, so the one read above can be edited and
+    # assigned back; its Transform is already the view's.
+    cb.Min = DB.XYZ(cmn_x, new_min_y, cmn_z)
+    cb.Max = DB.XYZ(cmx_x, new_max_y, cmx_z)
 
     try:
-        view.CropBox = new_cb
+        view.CropBox = cb
     except Exception as e:
         return False
     return True
 
 
-def _get_selected_markers_and_views():
-    markers = []
-    views = []
-    sel_ids = list(uidoc.Selection.GetElementIds())
-    for eid in sel_ids:
-        el = doc.GetElement(eid)
-        if isinstance(el, DB.ElevationMarker):
-            markers.append(el)
-        elif isinstance(el, DB.View) and _is_elev_view(el) and (not el.IsTemplate):
-            views.append(el)
-    return markers, views
-
-
 def _views_from_markers(markers):
     views = []
     seen = set()
     for marker in markers:
-        # Elevation markers can have up to 4 views (sometimes more depending on type).
-        for idx in range(0, 8):
-            try:
-                vid = marker.GetViewId(idx)
-            except Exception:
-                continue
+        # Only ask for slots the marker has; empty ones return InvalidElementId.
+        for idx in range(marker.MaximumViewCount):
+            vid = marker.GetViewId(idx)
             if not vid or vid == DB.ElementId.InvalidElementId:
                 continue
             if vid.IntegerValue in seen:
@@ -259,23 +406,25 @@ def _views_from_element(el):
 
 
 def apply_template_to_selected_elevations():
-    markers, direct_views = _get_selected_markers_and_views()
-    if not markers and not direct_views:
+    sel_ids = uidoc.Selection.GetElementIds()
+    if sel_ids.Count == 0:
         forms.alert("Select one or more elevation markers (or elevation views) and run again.", exitscript=True)
         return
 
-    views = _views_from_markers(markers)
-    # include directly-selected views
-    by_id = {v.Id.IntegerValue: v for v in views}
-    for v in direct_views:
-        by_id[v.Id.IntegerValue] = v
+    # Resolve views per selected element, in the order the selection reports
+    # them; markers, elevation views and marker "arrow" elements are all
+    # handled by _views_from_element.
+    found = []
+    for eid in sel_ids:
+        found.extend(_views_from_element(doc.GetElement(eid)))
 
-    # also try to resolve views from any selected marker "arrow" elements
-    for eid in uidoc.Selection.GetElementIds():
-        el = doc.GetElement(eid)
-        for v in _views_from_element(el):
-            by_id[v.Id.IntegerValue] = v
-    views = list(by_id.values())
+    seen = set()
+    views = []
+    for v in found:
+        key = v.Id.IntegerValue
+        if key not in seen:
+            seen.add(key)
+            views.append(v)
 
     if not views:
         forms.alert("No elevation views found from the selected markers.", exitscript=True)
@@ -285,29 +434,31 @@ def apply_template_to_selected_elevations():
     if not template:
         return
 
-    floors = DB.FilteredElementCollector(doc)\
-        .OfCategory(DB.BuiltInCategory.OST_Floors)\
-        .WhereElementIsNotElementType()\
-        .ToElements()
-    ceilings = DB.FilteredElementCollector(doc)\
-        .OfCategory(DB.BuiltInCategory.OST_Ceilings)\
-        .WhereElementIsNotElementType()\
-        .ToElements()
+    # Collected once and shared by every view below.
+    floors, ceilings = _collect_floors_and_ceilings()
 
-    applied = 0
+    bbox_cache = {}
+    floor_grid = _build_bbox_grid(floors, bbox_cache)
+    ceil_grid = _build_bbox_grid(ceilings, bbox_cache)
+    applied_views = []
     adjusted = 0
-    with revit.Transaction("Apply view template to elevations"):
-        for v in views:
-            try:
-                v.ViewTemplateId = template.Id
-                applied += 1
-            except Exception as e:
-                output.print_md("Template apply failed for view '{}': {}".format(v.Name, e))
-                continue
-            if _auto_fit_view_to_floor_and_ceiling(v, floors, ceilings, pad_ft=0.10):
-                adjusted += 1
-
-    output.print_md("Applied template '{}' to {} view(s).".format(template.Name, applied))
+    with revit.TransactionGroup("Apply view template to elevations"):
+        # Write every template first so the crop fit reads a model that has
+        # regenerated once, instead of once per view.
+        with revit.Transaction("Apply view template"):
+            for v in views:
+                try:
+                    v.ViewTemplateId = template.Id
+                    applied_views.append(v)
+                except Exception as e:
+                    output.print_md("Template apply failed for view '{}': {}".format(v.Name, e))
+
+        with revit.Transaction("Fit elevation crops"):
+            for v in applied_views:
+                if _auto_fit_view_to_floor_and_ceiling(v, floor_grid, ceil_grid, pad_ft=0.10):
+                    adjusted += 1
+
+    output.print_md("Applied template '{}' to {} view(s).".format(template.Name, len(applied_views)))
     output.print_md("Adjusted crop for {} view(s).".format(adjusted))
 
 
@@ -6,6 +6,9 @@ sets it as the 'Type Mark', and then places a Wall Tag with a leader,
 offset 200mm from the wall.
 """
 
+import math
+from collections import OrderedDict
+
 from pyrevit import revit, DB, UI
 from pyrevit import script
 from pyrevit import forms
@@ -29,19 +32,54 @@ output = script.get_output()
 MM_TO_FEET = 1.0 / 304.8
 TAG_OFFSET_MM = 200.0
 TAG_OFFSET_FEET = TAG_OFFSET_MM * MM_TO_FEET
+# API statics bound once instead of looked up again for every wall
+BASIS_X = DB.XYZ.BasisX
+BASIS_Z = DB.XYZ.BasisZ
+TAG_HORIZONTAL = DB.TagOrientation.Horizontal
 
 
 def get_wall_tag_type(document):
     """Finds the first available Wall Tag type (FamilySymbol) in the document."""
-    collector = (
+    return (
         DB.FilteredElementCollector(document)
         .OfCategory(DB.BuiltInCategory.OST_WallTags)
         .WhereElementIsElementType()
-        .ToElements()
+        .FirstElement()
     )
-    if collector:
-        return collector[0]
-    return None
+
+
+def get_tag_head_position(curve):
+    """Returns the tag head point: curve midpoint offset TAG_OFFSET_FEET in plan."""
+    if isinstance(curve, DB.Line):
+        # Straight walls (the common case): work from the two endpoints in
+        # plain floats instead of evaluating the curve through the API.
+        p0 = curve.GetEndPoint(0)
+        p1 = curve.GetEndPoint(1)
+        dx = p1.X - p0.X
+        dy = p1.Y - p0.Y
+        plan_length = math.sqrt(dx * dx + dy * dy)
+        if plan_length < 1e-9:  # Wall line is vertical in plan
+            off_x, off_y = 1.0, 0.0  # Default offset along X
+        else:  # Tangent x BasisZ, normalized
+            off_x, off_y = dy / plan_length, -dx / plan_length
+        return DB.XYZ(
+            (p0.X + p1.X) / 2.0 + off_x * TAG_OFFSET_FEET,
+            (p0.Y + p1.Y) / 2.0 + off_y * TAG_OFFSET_FEET,
+            (p0.Z + p1.Z) / 2.0,
+        )
+
+    mid_point_on_curve = curve.Evaluate(0.5, True)
+
+    tangent = curve.ComputeDerivatives(0.5, True).BasisX.Normalize()
+
+    # Offset direction perpendicular to tangent in XY plane (for plan views)
+    offset_dir = tangent.CrossProduct(BASIS_Z).Normalize()
+    if (
+        offset_dir.IsZeroLength()
+    ):  # If tangent is vertical (wall line is vertical in plan)
+        offset_dir = BASIS_X  # Default offset along X
+
+    return mid_point_on_curve + offset_dir * TAG_OFFSET_FEET
 
 
 def main():
@@ -61,163 +99,172 @@ def main():
         DB.FilteredElementCollector(doc, view.Id)
         .OfCategory(DB.BuiltInCategory.OST_Walls)
         .WhereElementIsNotElementType()
-        .ToElements()
     )
+    wall_count = walls_in_view.GetElementCount()
 
-    if not walls_in_view:
+    if not wall_count:
         forms.alert("No walls found in the current view.", exitscript=True)
 
     output.print_md(
-        "Found **{}** walls. Processing for tagging...".format(len(walls_in_view))
+        "Found **{}** walls. Processing for tagging...".format(wall_count)
     )
 
+    # Group instances by type so each Wall Type is looked up and evaluated
+    # once, not once per wall.
+    walls_by_type = OrderedDict()
+    for wall in walls_in_view:
+        type_id = wall.GetTypeId()
+        key = type_id.IntegerValue
+        if key not in walls_by_type:
+            walls_by_type[key] = (type_id, [])
+        walls_by_type[key][1].append(wall)
+
     with DB.Transaction(doc, "Auto Tag Walls Conditionally") as t:
         t.Start()
+        # Hold warnings until the single commit instead of surfacing them per
+        # tag, and discard them with the transaction if nothing gets tagged.
+        failure_options = t.GetFailureHandlingOptions()
+        failure_options.SetDelayedMiniWarnings(True)
+        failure_options.SetClearAfterRollback(True)
+        t.SetFailureHandlingOptions(failure_options)
 
-        processed_wall_type_details = (
-            {}
-        )  # Stores {ElementId_WallType: bool_is_taggable}
         tags_created_count = 0
         warnings_count = 0
-        processed_msg_shown_for_type = (
-            set()
-        )  # To avoid repetitive messages for same type
+        walls_to_tag = []
+        # Messages are gathered and written to the output window in one go.
+        report = []
 
-        for wall in walls_in_view:
-            wall_type = doc.GetElement(wall.GetTypeId())
+        for type_id, walls_of_type in walls_by_type.values():
+            wall_type = doc.GetElement(type_id)
             if not wall_type:
-                warnings_count += 1
+                warnings_count += len(walls_of_type)
                 continue
 
-            is_taggable_type = processed_wall_type_details.get(wall_type.Id)
-
-            if is_taggable_type is None:  # Not processed yet, determine if taggable
-                current_type_is_taggable = False  # Default for this type
-                type_name_param = wall_type.get_Parameter(
-                    DB.BuiltInParameter.SYMBOL_NAME_PARAM
-                )
-                type_name = ""
-
-                if type_name_param:
-                    type_name = type_name_param.AsString()
-
-                if type_name and "TYPE" in type_name.upper():
-                    name_parts = type_name.split(" ")
-                    if len(name_parts) >= 3:
-                        extracted_label = name_parts[
-                            2
-                        ]  # e.g., "A1" from "SS TYPE A1 ..."
-
-                        type_mark_param = wall_type.LookupParameter(
-                            "Type Mark"
-                        ) or wall_type.get_Parameter(
-                            DB.BuiltInParameter.ALL_MODEL_TYPE_MARK
-                        )
-
-                        if type_mark_param and not type_mark_param.IsReadOnly:
-                            try:
-                                current_tm_value = type_mark_param.AsString()
-                                if current_tm_value != extracted_label:
-                                    type_mark_param.Set(extracted_label)
-                                    if wall_type.Id not in processed_msg_shown_for_type:
-                                        output.print_md(
-                                            "- Updated Type Mark for Wall Type '{}' to '{}'".format(
-                                                type_name, extracted_label
-                                            )
-                                        )
-                                current_type_is_taggable = (
-                                    True  # Successfully set/verified Type Mark
-                                )
-                            except Exception as e_set:
-                                if wall_type.Id not in processed_msg_shown_for_type:
-                                    output.print_md(
-                                        "**WARNING:** Wall Type '{}': Failed to set Type Mark to '{}'. Error: {}".format(
-                                            type_name, extracted_label, e_set
-                                        )
-                                    )
-                                warnings_count += 1
-                        else:
-                            if wall_type.Id not in processed_msg_shown_for_type:
-                                output.print_md(
-                                    "**WARNING:** Wall Type '{}': 'Type Mark' parameter not found or is read-only.".format(
-                                        type_name
+            is_taggable_type = False  # Default for this type
+            type_name_param = wall_type.get_Parameter(
+                DB.BuiltInParameter.SYMBOL_NAME_PARAM
+            )
+            type_name = ""
+
+            if type_name_param:
+                type_name = type_name_param.AsString()
+
+            if type_name and "TYPE" in type_name.upper():
+                # Only the third word is needed; leave the rest unsplit.
+                name_parts = type_name.split(" ", 3)
+                if len(name_parts) >= 3:
+                    extracted_label = name_parts[
+                        2
+                    ]  # e.g., "A1" from "SS TYPE A1 ..."
+
+                    # Built-in first: direct and independent of the UI language.
+                    type_mark_param = wall_type.get_Parameter(
+                        DB.BuiltInParameter.ALL_MODEL_TYPE_MARK
+                    ) or wall_type.LookupParameter("Type Mark")
+
+                    if type_mark_param and not type_mark_param.IsReadOnly:
+                        try:
+                            current_tm_value = type_mark_param.AsString()
+                            if current_tm_value != extracted_label:
+                                type_mark_param.Set(extracted_label)
+                                report.append(
+                                    "- Updated Type Mark for Wall Type '{}' to '{}'".format(
+                                        type_name, extracted_label
                                     )
                                 )
-                            warnings_count += 1
-                    else:  # Name has "TYPE" but not enough parts
-                        if wall_type.Id not in processed_msg_shown_for_type:
-                            output.print_md(
-                                "**WARNING:** Wall Type '{}': Contains 'TYPE' but name parts < 3 (expected '... TYPE LABEL ...').".format(
-                                    type_name
-                                )
+                            is_taggable_type = (
+                                True  # Successfully set/verified Type Mark
                             )
-                        warnings_count += 1
-                else:  # Name does not contain "TYPE" or is empty
-                    if (
-                        type_name and wall_type.Id not in processed_msg_shown_for_type
-                    ):  # Only message if name exists
-                        output.print_md(
-                            "- Wall Type '{}': Name does not contain 'TYPE', skipping.".format(
-                                type_name
+                        except Exception as e_set:
+                            report.append(
+                                "**WARNING:** Wall Type '{}': Failed to set Type Mark to '{}'. Error: {}".format(
+                                    type_name, extracted_label, e_set
+                                )
                             )
-                        )
-                    # warnings_count +=1 # Not strictly a warning if it's just a skip condition
-
-                processed_wall_type_details[wall_type.Id] = current_type_is_taggable
-                is_taggable_type = current_type_is_taggable
-                processed_msg_shown_for_type.add(wall_type.Id)
-
-            if is_taggable_type:  # Proceed to tag this wall instance
-                try:
-                    location_curve = wall.Location
-                    if isinstance(location_curve, DB.LocationCurve):
-                        curve = location_curve.Curve
-                        mid_point_on_curve = curve.Evaluate(0.5, True)
-
-                        tangent = curve.ComputeDerivatives(0.5, True).BasisX.Normalize()
-
-                        # Offset direction perpendicular to tangent in XY plane (for plan views)
-                        offset_dir = tangent.CrossProduct(DB.XYZ.BasisZ).Normalize()
-                        if (
-                            offset_dir.IsZeroLength()
-                        ):  # If tangent is vertical (wall line is vertical in plan)
-                            offset_dir = DB.XYZ.BasisX  # Default offset along X
-
-                        tag_head_position = (
-                            mid_point_on_curve + offset_dir * TAG_OFFSET_FEET
-                        )
-
-                        DB.IndependentTag.Create(
-                            doc,
-                            wall_tag_type.Id,
-                            view.Id,
-                            DB.Reference(wall),
-                            True,  # Add Leader
-                            DB.TagOrientation.Horizontal,
-                            tag_head_position,
-                        )
-                        tags_created_count += 1
+                            warnings_count += 1
                     else:
-                        output.print_md(
-                            "**WARNING:** Wall ID {}: No LocationCurve found. Cannot place tag.".format(
-                                wall.Id.ToString()
+                        report.append(
+                            "**WARNING:** Wall Type '{}': 'Type Mark' parameter not found or is read-only.".format(
+                                type_name
                             )
                         )
                         warnings_count += 1
-                except RevitExceptions.InvalidOperationException:
-                    output.print_md(
-                        "**WARNING:** Wall ID {}: Curve cannot be evaluated (e.g., unbound). Cannot place tag.".format(
-                            wall.Id.ToString()
+                else:  # Name has "TYPE" but not enough parts
+                    report.append(
+                        "**WARNING:** Wall Type '{}': Contains 'TYPE' but name parts < 3 (expected '... TYPE LABEL ...').".format(
+                            type_name
                         )
                     )
                     warnings_count += 1
-                except Exception as e_tag:
-                    output.print_md(
-                        "**ERROR:** Failed to tag Wall ID {}: {}".format(
-                            wall.Id.ToString(), e_tag
+            else:  # Name does not contain "TYPE" or is empty
+                if type_name:  # Only message if name exists
+                    report.append(
+                        "- Wall Type '{}': Name does not contain 'TYPE', skipping.".format(
+                            type_name
+                        )
+                    )
+                # warnings_count +=1 # Not strictly a warning if it's just a skip condition
+
+            if is_taggable_type:
+                walls_to_tag.extend(walls_of_type)
+
+        # Read every tag position before creating any tags. Geometry reads
+        # after a write can make Revit regenerate, so interleaving reads and
+        # creates would regenerate once per wall instead of once here.
+        placements = []
+        for wall in walls_to_tag:
+            try:
+                location_curve = wall.Location
+                if isinstance(location_curve, DB.LocationCurve):
+                    placements.append(
+                        (wall, get_tag_head_position(location_curve.Curve))
+                    )
+                else:
+                    report.append(
+                        "**WARNING:** Wall ID {}: No LocationCurve found. Cannot place tag.".format(
+                            wall.Id.ToString()
                         )
                     )
                     warnings_count += 1
+            except RevitExceptions.InvalidOperationException:
+                report.append(
+                    "**WARNING:** Wall ID {}: Curve cannot be evaluated (e.g., unbound). Cannot place tag.".format(
+                        wall.Id.ToString()
+                    )
+                )
+                warnings_count += 1
+            except Exception as e_tag:
+                report.append(
+                    "**ERROR:** Failed to tag Wall ID {}: {}".format(
+                        wall.Id.ToString(), e_tag
+                    )
+                )
+                warnings_count += 1
+
+        tag_type_id = wall_tag_type.Id
+        view_id = view.Id
+        for wall, tag_head_position in placements:
+            try:
+                DB.IndependentTag.Create(
+                    doc,
+                    tag_type_id,
+                    view_id,
+                    DB.Reference(wall),
+                    True,  # Add Leader
+                    TAG_HORIZONTAL,
+                    tag_head_position,
+                )
+                tags_created_count += 1
+            except Exception as e_tag:
+                report.append(
+                    "**ERROR:** Failed to tag Wall ID {}: {}".format(
+                        wall.Id.ToString(), e_tag
+                    )
+                )
+                warnings_count += 1
+
+        if report:
+            output.print_md("\n\n".join(report))
 
         # --- Transaction Commit/Rollback Logic ---
         if tags_created_count > 0:
@@ -10,10 +10,22 @@ from System.Collections.Generic import List
 # --- Configuration ---
 DEFAULT_OFFSET_MM = 1000  # Default offset for dimension line in millimeters
 MIN_WALL_LENGTH_MM = 50   # Minimum wall length in mm to attempt dimensioning
+MM_TO_FEET = 1.0 / 304.8  # Revit internal length units are feet
+DIMENSION_BATCH_SIZE = 100  # Dimensions created per sub-transaction
+DEBUG = True  # Show per-wall errors in the output window when done
 
 
 # --- Helper Functions ---
-# (No changes to helper functions: get_offset_distance_from_user, get_wall_solid, find_wall_end_face_references)
+
+# Per-wall error messages, printed together once the script has finished
+_diagnostics = []
+
+
+def _debug(message, *args):
+    """Records a diagnostic; the message is only formatted when DEBUG is on."""
+    if DEBUG:
+        _diagnostics.append(message.format(*args))
+
 
 def get_offset_distance_from_user(prompt_message, default_value_mm):
     """Asks user for an offset distance in millimeters and converts to internal units (feet)."""
@@ -29,8 +41,8 @@ def get_offset_distance_from_user(prompt_message, default_value_mm):
                 "Offset distance must be a positive number.", title="Input Error"
             )
             return None
-        # Convert millimeters to Revit's internal units (typically feet)
-        return DB.UnitUtils.ConvertToInternalUnits(dist_mm, DB.UnitTypeId.Millimeters)
+        # Convert millimeters to Revit's internal units (feet)
+        return dist_mm * MM_TO_FEET
     except ValueError:
         forms.alert(
             "Invalid input. Please enter a valid number for the offset.",
@@ -39,8 +51,8 @@ def get_offset_distance_from_user(prompt_message, default_value_mm):
         return None
 
 
-def get_wall_solid(wall, view_for_options):
-    """Gets the solid geometry of a wall, considering the view context."""
+def get_geometry_options(view_for_options):
+    """Geometry options for dimensioning; build once and reuse for every wall."""
     options = DB.Options()
     options.ComputeReferences = (
         True  # Crucial for getting valid references for dimensions
@@ -49,7 +61,11 @@ def get_wall_solid(wall, view_for_options):
     options.View = (
         view_for_options  # Contextualize geometry to how it appears in the view
     )
+    return options
 
+
+def get_wall_solid(wall, options):
+    """Gets the solid geometry of a wall, using options from get_geometry_options."""
     geom_element = wall.get_Geometry(options)
     if not geom_element:
         return None
@@ -71,7 +87,8 @@ def find_wall_end_face_references(wall, wall_solid, wall_location_curve):
     """
     Attempts to find two distinct face references on the wall solid that represent its ends,
     perpendicular to the wall's location curve direction.
-    Returns a list of DB.Reference.
+    Returns a list of DB.Reference; when there are two, their stable
+    representations are already known to differ.
     """
     end_face_refs = []
     if not wall_solid or not isinstance(wall_location_curve, DB.Line):
@@ -80,6 +97,7 @@ def find_wall_end_face_references(wall, wall_solid, wall_location_curve):
     wall_start_pt = wall_location_curve.GetEndPoint(0)
     wall_end_pt = wall_location_curve.GetEndPoint(1)
     wall_direction = (wall_end_pt - wall_start_pt).Normalize()
+    reverse_wall_direction = wall_direction.Negate()
 
     candidate_faces = []
     for face in wall_solid.Faces:
@@ -89,58 +107,102 @@ def find_wall_end_face_references(wall, wall_solid, wall_location_curve):
             # This implies the face is perpendicular to the wall's run (i.e., an end cap)
             if face_normal.IsAlmostEqualTo(
                 wall_direction
-            ) or face_normal.IsAlmostEqualTo(-wall_direction):
-                candidate_faces.append(face.Reference)
+            ) or face_normal.IsAlmostEqualTo(reverse_wall_direction):
+                candidate_faces.append(face)
 
     if not candidate_faces:
         return end_face_refs
 
-    # Sort candidate faces by their projected position along the wall's location curve
-    # to find the "first" and "last" end face.
-    refs_with_projection = []
-    for ref in candidate_faces:
+    if len(candidate_faces) == 2:
+        # The usual straight wall: two distinct end caps, nothing to rank
+        return [face.Reference for face in candidate_faces]
+
+    # Track the candidate faces nearest to and furthest from the wall start,
+    # by projected position along the wall's location curve, in one pass.
+    min_item = None
+    max_item = None
+    for face in candidate_faces:
         try:
-            geom_face = wall.GetGeometryObjectFromReference(ref)
-            if isinstance(geom_face, DB.Face):
-                uv_center = (
-                    geom_face.GetBoundingBox().Min + geom_face.GetBoundingBox().Max
-                ) / 2.0
-                point_on_face = geom_face.Evaluate(uv_center)
-                projection_result = wall_location_curve.Project(point_on_face)
-                distance_from_start = projection_result.XYZPoint.DistanceTo(
-                    wall_start_pt
-                )
-                refs_with_projection.append(
-                    {
-                        "ref": ref,
-                        "dist": distance_from_start,
-                        "stable": ref.ConvertToStableRepresentation(
-                            revit.doc
-                        ),  # For ensuring uniqueness
-                    }
-                )
+            # End faces are perpendicular to the wall, so any point on the
+            # face's plane projects to the same place; the plane origin does.
+            projection_result = wall_location_curve.Project(face.Origin)
+            distance_from_start = projection_result.XYZPoint.DistanceTo(
+                wall_start_pt
+            )
+            ref = face.Reference
+            if min_item is None or distance_from_start < min_item[0]:
+                min_item = (distance_from_start, ref)
+            if max_item is None or distance_from_start > max_item[0]:
+                max_item = (distance_from_start, ref)
         except Exception as ex_proj:
-            print(
-                "Error processing reference for sorting (Wall ID {}): {}".format(
-                    wall.Id, ex_proj
-                )
+            _debug(
+                "Error processing reference for sorting (Wall ID {}): {}",
+                wall.Id,
+                ex_proj,
             )
             continue
 
-    # Ensure uniqueness and sort
-    unique_refs_map = {item["stable"]: item for item in refs_with_projection}
-    sorted_unique_refs = sorted(unique_refs_map.values(), key=lambda x: x["dist"])
+    if min_item is None or min_item is max_item:
+        return end_face_refs
 
-    if len(sorted_unique_refs) >= 2:
-        # Found at least two distinct end faces
-        end_face_refs.append(sorted_unique_refs[0]["ref"])  # Closest to wall start
-        end_face_refs.append(
-            sorted_unique_refs[-1]["ref"]
-        )  # Furthest from wall start (closest to end)
+    # Only the two picks need their stable representations compared
+    min_ref = min_item[1]
+    max_ref = max_item[1]
+    if min_ref.ConvertToStableRepresentation(
+        revit.doc
+    ) != max_ref.ConvertToStableRepresentation(revit.doc):
+        # Found two distinct end faces
+        end_face_refs.append(min_ref)  # Closest to wall start
+        end_face_refs.append(max_ref)  # Furthest from wall start (closest to end)
 
     return end_face_refs
 
 
+def create_dimensions(doc, view, pending_dimensions):
+    """
+    Creates a dimension for each (wall id, placement line, references) in
+    pending_dimensions, inside the caller's transaction.
+    Dimensions are created a batch per sub-transaction. A batch that hits an
+    error is rolled back and redone one sub-transaction per dimension, so a
+    failure only costs its own dimension.
+    Returns (ids of the created dimensions, number that failed).
+    """
+    created_ids = []
+    failed_count = 0
+    for start in range(0, len(pending_dimensions), DIMENSION_BATCH_SIZE):
+        batch = pending_dimensions[start:start + DIMENSION_BATCH_SIZE]
+        st = DB.SubTransaction(doc)
+        st.Start()
+        try:
+            dimensions = [
+                doc.Create.NewDimension(view, placement_line, references_array)
+                for _, placement_line, references_array in batch
+            ]
+        except Exception:
+            st.RollBack()
+        else:
+            st.Commit()
+            created_ids.extend(d.Id for d in dimensions if d)
+            continue
+
+        for wall_id, placement_line, references_array in batch:
+            st = DB.SubTransaction(doc)
+            st.Start()
+            try:
+                dimension = doc.Create.NewDimension(
+                    view, placement_line, references_array
+                )
+            except Exception as ex:
+                st.RollBack()
+                failed_count += 1
+                _debug("Error dimensioning wall (ID: {}): {}", wall_id, ex)
+                continue
+            st.Commit()
+            if dimension:
+                created_ids.append(dimension.Id)
+    return created_ids, failed_count
+
+
 # --- Main Script Logic ---
 def dimension_walls_in_current_view():
     doc = revit.doc
@@ -174,100 +236,107 @@ def dimension_walls_in_current_view():
     if offset_internal_units is None:
         script.exit()
 
+    min_wall_length_internal = MIN_WALL_LENGTH_MM * MM_TO_FEET
+    # Let Revit drop walls that are too short before they reach Python
+    long_enough_filter = DB.ElementParameterFilter(
+        DB.ParameterFilterRuleFactory.CreateGreaterOrEqualRule(
+            DB.ElementId(DB.BuiltInParameter.CURVE_ELEM_LENGTH),
+            min_wall_length_internal,
+            1e-9,
+        )
+    )
+
+    # OfClass(Wall) leaves out in-place wall families, which have no
+    # location line to dimension.
     walls_to_dimension = (
         DB.FilteredElementCollector(doc, active_view.Id)
-        .OfCategory(DB.BuiltInCategory.OST_Walls)
+        .OfClass(DB.Wall)
         .WhereElementIsNotElementType()
-        .ToElements()
+        .WherePasses(long_enough_filter)
     )
 
-    if not walls_to_dimension:
+    if walls_to_dimension.GetElementCount() == 0:
         forms.alert("No walls found in the current view.", title="No Walls Found")
         return
 
-    # --- EDITED: Initialize lists to store results ---
-    created_dimension_ids = []  # Store IDs of new dimensions for selection
-    created_dimensions_count = 0
     failed_walls_count = 0
-    min_wall_length_internal = DB.UnitUtils.ConvertToInternalUnits(
-        MIN_WALL_LENGTH_MM, DB.UnitTypeId.Millimeters
-    )
 
-    with DB.Transaction(doc, "Dimension Walls in Current View") as t:
-        t.Start()
-        for wall in walls_to_dimension:
-            try:
-                location_curve = wall.Location.Curve
-                if not location_curve or not location_curve.IsBound:
-                    failed_walls_count += 1
-                    continue
-
-                if not isinstance(location_curve, DB.Line):
-                    failed_walls_count += 1
-                    continue
-
-                if location_curve.Length < min_wall_length_internal:
-                    failed_walls_count += 1
-                    continue
-
-                p1 = location_curve.GetEndPoint(0)
-                p2 = location_curve.GetEndPoint(1)
-                wall_direction_3d = (p2 - p1).Normalize()
-                view_normal = active_view.ViewDirection
-                wall_dir_in_view = (
-                    wall_direction_3d
-                    - wall_direction_3d.DotProduct(view_normal) * view_normal
-                )
+    geometry_options = get_geometry_options(active_view)
+    # Same for every wall; read once rather than per wall
+    view_normal = active_view.ViewDirection
+    xyz_zero = DB.XYZ.Zero
 
-                if wall_dir_in_view.IsAlmostEqualTo(DB.XYZ.Zero):
-                    failed_walls_count += 1
-                    continue
-                wall_dir_in_view = wall_dir_in_view.Normalize()
-
-                offset_vector_in_view = wall_dir_in_view.CrossProduct(
-                    view_normal
-                ).Normalize()
-                
-                dim_line_p1 = p1 + offset_vector_in_view * offset_internal_units
-                dim_line_p2 = p2 + offset_vector_in_view * offset_internal_units
-                dimension_placement_line = DB.Line.CreateBound(dim_line_p1, dim_line_p2)
-
-                references_array = DB.ReferenceArray()
-                wall_solid = get_wall_solid(wall, active_view)
-                
-                if wall_solid:
-                    end_face_refs = find_wall_end_face_references(
-                        wall, wall_solid, location_curve
-                    )
-                    if len(end_face_refs) == 2:
-                        references_array.Append(end_face_refs[0])
-                        references_array.Append(end_face_refs[1])
-
-                if references_array.Size == 2:
-                    ref1_stable = references_array.get_Item(
-                        0
-                    ).ConvertToStableRepresentation(doc)
-                    ref2_stable = references_array.get_Item(
-                        1
-                    ).ConvertToStableRepresentation(doc)
-
-                    if ref1_stable != ref2_stable:
-                        # --- EDITED: Capture the newly created dimension ---
-                        new_dimension = doc.Create.NewDimension(
-                            active_view, dimension_placement_line, references_array
-                        )
-                        # If creation was successful, add its ID to our list
-                        if new_dimension:
-                            created_dimension_ids.append(new_dimension.Id)
-                            created_dimensions_count += 1
-                    else:
-                        failed_walls_count += 1
-                elif wall_solid:
-                    failed_walls_count += 1
+    # Pass 1: work out every dimension without touching the model.
+    # (wall id, placement line, references) per wall that can be dimensioned
+    pending_dimensions = []
+    for wall in walls_to_dimension:
+        try:
+            # OfClass(Wall) guarantees a LocationCurve; only straight, bound
+            # lines can be dimensioned. An exact type check also rejects None.
+            location_curve = wall.Location.Curve
+            if type(location_curve) is not DB.Line or not location_curve.IsBound:
+                failed_walls_count += 1
+                continue
 
-            except Exception as ex:
+            # Backstop: the Length parameter and the location line can
+            # disagree slightly at joins.
+            if location_curve.Length < min_wall_length_internal:
+                failed_walls_count += 1
+                continue
+
+            p1 = location_curve.GetEndPoint(0)
+            p2 = location_curve.GetEndPoint(1)
+            wall_direction_3d = (p2 - p1).Normalize()
+            wall_dir_in_view = (
+                wall_direction_3d
+                - wall_direction_3d.DotProduct(view_normal) * view_normal
+            )
+
+            if wall_dir_in_view.IsAlmostEqualTo(xyz_zero):
+                failed_walls_count += 1
+                continue
+            wall_dir_in_view = wall_dir_in_view.Normalize()
+
+            # Both are unit length and perpendicular, so the cross product
+            # is already a unit vector.
+            offset_vector_in_view = (
+                wall_dir_in_view.CrossProduct(view_normal) * offset_internal_units
+            )
+
+            dim_line_p1 = p1 + offset_vector_in_view
+            dim_line_p2 = p2 + offset_vector_in_view
+            dimension_placement_line = DB.Line.CreateBound(dim_line_p1, dim_line_p2)
+
+            references_array = DB.ReferenceArray()
+            wall_solid = get_wall_solid(wall, geometry_options)
+            
+            if wall_solid:
+                end_face_refs = find_wall_end_face_references(
+                    wall, wall_solid, location_curve
+                )
+                if len(end_face_refs) == 2:
+                    references_array.Append(end_face_refs[0])
+                    references_array.Append(end_face_refs[1])
+
+            if references_array.Size == 2:
+                pending_dimensions.append(
+                    (wall.Id, dimension_placement_line, references_array)
+                )
+            elif wall_solid:
                 failed_walls_count += 1
-                print("Error dimensioning wall (ID: {}): {}".format(wall.Id, ex))
+
+        except Exception as ex:
+            failed_walls_count += 1
+            _debug("Error dimensioning wall (ID: {}): {}", wall.Id, ex)
+
+    with DB.Transaction(doc, "Dimension Walls in Current View") as t:
+        t.Start()
+        # Pass 2: create them
+        created_dimension_ids, create_failures = create_dimensions(
+            doc, active_view, pending_dimensions
+        )
+        failed_walls_count += create_failures
+        created_dimensions_count = len(created_dimension_ids)
 
         if created_dimensions_count > 0:
             t.Commit()
@@ -276,16 +345,14 @@ def dimension_walls_in_current_view():
             if created_dimension_ids:
                 # The API requires a .NET List, not a Python list
                 net_element_ids = List[DB.ElementId](created_dimension_ids)
+                # The commit and the selection change already redraw the view
                 uidoc.Selection.SetElementIds(net_element_ids)
-                uidoc.RefreshActiveView() # Ensures the selection highlight is visible
 
-            forms.alert(
-                "Successfully created and selected {} overall dimension(s).\n"
-                "{} wall(s) could not be dimensioned or were skipped.".format(
-                    created_dimensions_count, failed_walls_count
-                ),
-                title="Dimensioning Complete",
-                warn_icon=False,
+            # Non-modal, unlike forms.alert; failures below still get a dialog
+            script.get_output().print_md(
+                "**Dimensioning Complete**: created and selected {} overall "
+                "dimension(s); {} wall(s) could not be dimensioned or were "
+                "skipped.".format(created_dimensions_count, failed_walls_count)
             )
         else:
             t.RollBack()
@@ -302,6 +369,10 @@ def dimension_walls_in_current_view():
 if __name__ == "__main__":
     if revit.doc:
         dimension_walls_in_current_view()
+        if _diagnostics:
+            script.get_output().print_md(
+                "```\n" + "\n".join(_diagnostics) + "\n```"
+            )
     else:
         forms.alert(
             "No active Revit document found. Please open a project.", title="Error"
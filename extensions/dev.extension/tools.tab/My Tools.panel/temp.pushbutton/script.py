@@ -23,29 +23,102 @@ uidoc = revit.uidoc
 output = script.get_output()
 
 # --- Helpers ---
-def _transform_bbox_to_view_local(bb_model, inv_t):
-    pts = []
+def _transform_rows(t):
+    # The transform as plain float rows: out_i = origin_i + row_i . point.
+    o, bx, by, bz = t.Origin, t.BasisX, t.BasisY, t.BasisZ
+    return ((o.X, bx.X, by.X, bz.X),
+            (o.Y, bx.Y, by.Y, bz.Y),
+            (o.Z, bx.Z, by.Z, bz.Z))
+
+
+def _transform_bbox_to_view_local(bb_model, rows):
+    # Bounds of the 8 transformed corners, taken per axis from the smaller and
+    # larger of each term, so no DB.XYZ is built and OfPoint is never called.
+    try:
+        mn = bb_model.Min
+        mx = bb_model.Max
+        mn_x, mn_y, mn_z = mn.X, mn.Y, mn.Z
+        mx_x, mx_y, mx_z = mx.X, mx.Y, mx.Z
+    except Exception:
+        return None
+
+    lo = []
+    hi = []
+    for o, a, b, c in rows:
+        ax0, ax1 = a * mn_x, a * mx_x
+        by0, by1 = b * mn_y, b * mx_y
+        cz0, cz1 = c * mn_z, c * mx_z
+        lo.append(o + min(ax0, ax1) + min(by0, by1) + min(cz0, cz1))
+        hi.append(o + max(ax0, ax1) + max(by0, by1) + max(cz0, cz1))
+    return lo[0], lo[1], lo[2], hi[0], hi[1], hi[2]
+
+
+def _axis_permutation(rows):
+    # When the view's axes line up with world axes (the usual elevation), each
+    # view-local coordinate is one world coordinate, maybe negated, plus an
+    # offset. Returns (world_axis, sign, offset) per view axis, or None.
+    perm = []
+    for o, a, b, c in rows:
+        hit = None
+        for axis, v in enumerate((a, b, c)):
+            if abs(abs(v) - 1.0) < 1e-9:
+                hit = (axis, 1.0 if v > 0 else -1.0, o)
+            elif abs(v) > 1e-9:
+                return None
+        if hit is None:
+            return None
+        perm.append(hit)
+    return perm
+
+
+def _aligned_bbox_to_view_local(bb_model, perm):
     try:
         mn = bb_model.Min
         mx = bb_model.Max
-        corners = [
-            DB.XYZ(mn.X, mn.Y, mn.Z),
-            DB.XYZ(mn.X, mn.Y, mx.Z),
-            DB.XYZ(mn.X, mx.Y, mn.Z),
-            DB.XYZ(mn.X, mx.Y, mx.Z),
-            DB.XYZ(mx.X, mn.Y, mn.Z),
-            DB.XYZ(mx.X, mn.Y, mx.Z),
-            DB.XYZ(mx.X, mx.Y, mn.Z),
-            DB.XYZ(mx.X, mx.Y, mx.Z),
-        ]
-        for p in corners:
-            pts.append(inv_t.OfPoint(p))
+        mn = (mn.X, mn.Y, mn.Z)
+        mx = (mx.X, mx.Y, mx.Z)
     except Exception:
         return None
 
-    vmin = DB.XYZ(min(p.X for p in pts), min(p.Y for p in pts), min(p.Z for p in pts))
-    vmax = DB.XYZ(max(p.X for p in pts), max(p.Y for p in pts), max(p.Z for p in pts))
-    return vmin, vmax
+    lo = []
+    hi = []
+    for axis, sign, o in perm:
+        if sign > 0:
+            lo.append(o + mn[axis])
+            hi.append(o + mx[axis])
+        else:
+            lo.append(o - mx[axis])
+            hi.append(o - mn[axis])
+    return lo[0], lo[1], lo[2], hi[0], hi[1], hi[2]
+
+
+# Stand-in for "no limit" on world axes the crop leaves open; well past the
+# ~20 mile extent Revit allows for model geometry.
+_UNBOUNDED_FT = 1.0e6
+
+
+def _world_crop_outline(t, crop_min, crop_max):
+    """World-space Outline around the crop's view-local X/Z footprint.
+
+    View-local Y is left open, so any world axis it contributes to is unbounded.
+    """
+    pts = []
+    for x in (crop_min.X, crop_max.X):
+        for z in (crop_min.Z, crop_max.Z):
+            p = t.OfPoint(DB.XYZ(x, 0.0, z))
+            pts.append((p.X, p.Y, p.Z))
+
+    by = t.BasisY
+    lo = []
+    hi = []
+    for axis, b in enumerate((by.X, by.Y, by.Z)):
+        if abs(b) > 1e-9:
+            lo.append(-_UNBOUNDED_FT)
+            hi.append(_UNBOUNDED_FT)
+        else:
+            lo.append(min(p[axis] for p in pts))
+            hi.append(max(p[axis] for p in pts))
+    return DB.Outline(DB.XYZ(lo[0], lo[1], lo[2]), DB.XYZ(hi[0], hi[1], hi[2]))
 
 # --- Temp Logic: expand active elevation crop ---
 def expand_active_elevation_crop_by_100ft():
@@ -64,19 +137,21 @@ def expand_active_elevation_crop_by_100ft():
         return
 
     try:
-        view.CropBoxActive = True
+        if not view.CropBoxActive:
+            view.CropBoxActive = True
     except Exception:
         pass
 
     # Expand width/height by 100' total (50' each side) in view-local X/Y
     expand = 50.0
-    new_cb = DB.BoundingBoxXYZ()
-    new_cb.Transform = cb.Transform
-    new_cb.Min = DB.XYZ(cb.Min.X - expand, cb.Min.Y - expand, cb.Min.Z)
-    new_cb.Max = DB.XYZ(cb.Max.X + expand, cb.Max.Y + expand, cb.Max.Z)
+    # view.CropBox returns a copy; edit it and assign it back.
+    crop_min = cb.Min
+    crop_max = cb.Max
+    cb.Min = DB.XYZ(crop_min.X - expand, crop_min.Y - expand, crop_min.Z)
+    cb.Max = DB.XYZ(crop_max.X + expand, crop_max.Y + expand, crop_max.Z)
 
     with revit.Transaction("Temp expand elevation crop by 100ft"):
-        view.CropBox = new_cb
+        view.CropBox = cb
 
     output.print_md("Expanded crop for view '{}' by 100' width/height.".format(view.Name))
     list_floors_and_ceilings_in_active_view()
@@ -90,42 +165,40 @@ def list_floors_and_ceilings_in_active_view():
 
     floors = DB.FilteredElementCollector(doc, view.Id)\
         .OfCategory(DB.BuiltInCategory.OST_Floors)\
-        .WhereElementIsNotElementType()\
-        .ToElements()
+        .WhereElementIsNotElementType()
 
     ceilings = DB.FilteredElementCollector(doc, view.Id)\
         .OfCategory(DB.BuiltInCategory.OST_Ceilings)\
-        .WhereElementIsNotElementType()\
-        .ToElements()
+        .WhereElementIsNotElementType()
+    floor_count = floors.GetElementCount()
+    ceiling_count = ceilings.GetElementCount()
 
-    inv_t = view.CropBox.Transform.Inverse if view.CropBox else None
+    inv_rows = _transform_rows(view.CropBox.Transform.Inverse) if view.CropBox else None
 
     output.print_md("### Floors/Ceilings in Active View: {}".format(view.Name))
-    output.print_md("* Floors: {}".format(len(floors)))
-    output.print_md("* Ceilings: {}".format(len(ceilings)))
+    output.print_md("* Floors: {}".format(floor_count))
+    output.print_md("* Ceilings: {}".format(ceiling_count))
 
-    if floors:
+    if floor_count:
         output.print_md("#### Floors")
         for f in floors:
             z_info = ""
-            if inv_t:
+            if inv_rows:
                 bb = f.get_BoundingBox(None)
-                vbb = _transform_bbox_to_view_local(bb, inv_t) if bb else None
+                vbb = _transform_bbox_to_view_local(bb, inv_rows) if bb else None
                 if vbb:
-                    vmin, vmax = vbb
-                    z_info = " | Z min {:.3f}, max {:.3f}".format(vmin.Z, vmax.Z)
+                    z_info = " | Z min {:.3f}, max {:.3f}".format(vbb[2], vbb[5])
             output.print_md("- {} (ID {}){}".format(f.Name, f.Id.IntegerValue, z_info))
 
-    if ceilings:
+    if ceiling_count:
         output.print_md("#### Ceilings")
         for c in ceilings:
             z_info = ""
-            if inv_t:
+            if inv_rows:
                 bb = c.get_BoundingBox(None)
-                vbb = _transform_bbox_to_view_local(bb, inv_t) if bb else None
+                vbb = _transform_bbox_to_view_local(bb, inv_rows) if bb else None
                 if vbb:
-                    vmin, vmax = vbb
-                    z_info = " | Z min {:.3f}, max {:.3f}".format(vmin.Z, vmax.Z)
+                    z_info = " | Z min {:.3f}, max {:.3f}".format(vbb[2], vbb[5])
             output.print_md("- {} (ID {}){}".format(c.Name, c.Id.IntegerValue, z_info))
 
 
@@ -145,105 +218,142 @@ def auto_fit_active_view_to_floor_and_ceiling(pad_ft=0.10):
         return
 
     try:
-        view.CropBoxActive = True
+        if not view.CropBoxActive:
+            view.CropBoxActive = True
     except Exception:
         pass
 
-    inv_t = cb.Transform.Inverse
+    inv_rows = _transform_rows(cb.Transform.Inverse)
+    perm = _axis_permutation(inv_rows)
     crop_min = cb.Min
     crop_max = cb.Max
 
     # Collect from the full model, then filter by view-local X/Z so crop height doesn't matter.
-    floors = DB.FilteredElementCollector(doc)\
-        .OfCategory(DB.BuiltInCategory.OST_Floors)\
-        .WhereElementIsNotElementType()\
-        .ToElements()
-
-    ceilings = DB.FilteredElementCollector(doc)\
-        .OfCategory(DB.BuiltInCategory.OST_Ceilings)\
-        .WhereElementIsNotElementType()\
-        .ToElements()
+    cats = List[DB.BuiltInCategory]([DB.BuiltInCategory.OST_Floors,
+                                     DB.BuiltInCategory.OST_Ceilings])
+    collector = DB.FilteredElementCollector(doc)\
+        .WherePasses(DB.ElementMulticategoryFilter(cats))\
+        .WhereElementIsNotElementType()
+    if perm:
+        # With the view's axes on world axes, an element's world bbox maps
+        # exactly onto its view-local one, so the bounding box quick filter
+        # drops only what the X/Z test below would reject anyway. In rotated
+        # views the view-local bbox is inflated and the world outline is not
+        # a safe prune, so every element goes through the Python test.
+        collector = collector.WherePasses(DB.BoundingBoxIntersectsFilter(
+            _world_crop_outline(cb.Transform, crop_min, crop_max)))
+
+    floor_cat_id = int(DB.BuiltInCategory.OST_Floors)
+    floors = []
+    ceilings = []
+    for el in collector:
+        if el.Category.Id.IntegerValue == floor_cat_id:
+            floors.append(el)
+        else:
+            ceilings.append(el)
 
     # For elevation/section views, view-local Y is the vertical axis.
     max_thickness_ft = 5.0
     center_x = (crop_min.X + crop_max.X) / 2.0
     center_z = (crop_min.Z + crop_max.Z) / 2.0
-    all_floor_cands = []
-    all_ceil_cands = []
+    # Candidates thicker than max_thickness_ft are kept apart and only used
+    # when nothing thinner is in view.
+    floor_cands = []
+    ceil_cands = []
+    thick_floor_cands = []
+    thick_ceil_cands = []
 
     for f in floors:
         bb = f.get_BoundingBox(None)
-        vbb = _transform_bbox_to_view_local(bb, inv_t) if bb else None
+        if not bb:
+            continue
+        if perm:
+            vbb = _aligned_bbox_to_view_local(bb, perm)
+        else:
+            vbb = _transform_bbox_to_view_local(bb, inv_rows)
         if not vbb:
             continue
-        vmin, vmax = vbb
-        if vmax.X < crop_min.X or vmin.X > crop_max.X:
+        vmin_x, vmin_y, vmin_z, vmax_x, vmax_y, vmax_z = vbb
+        if vmax_x < crop_min.X or vmin_x > crop_max.X:
+            continue
+        if vmax_z < crop_min.Z or vmin_z > crop_max.Z:
             continue
-        if vmax.Z < crop_min.Z or vmin.Z > crop_max.Z:
+        is_thin = abs(vmax_y - vmin_y) <= max_thickness_ft
+        # Once a thin one is found, thick ones can never be picked.
+        if not is_thin and floor_cands:
             continue
-        thickness = abs(vmax.Y - vmin.Y)
-        cx = (vmin.X + vmax.X) / 2.0
-        cz = (vmin.Z + vmax.Z) / 2.0
-        dist = ((cx - center_x) ** 2 + (cz - center_z) ** 2) ** 0.5
-        all_floor_cands.append({
-            "top_y": vmax.Y,
-            "dist": dist,
-            "thickness": thickness,
+        cx = (vmin_x + vmax_x) / 2.0
+        cz = (vmin_z + vmax_z) / 2.0
+        # Squared distance ranks the same as distance; no sqrt needed.
+        cand = {
+            "top_y": vmax_y,
+            "dist_sq": (cx - center_x) ** 2 + (cz - center_z) ** 2,
             "id": f.Id.IntegerValue,
             "name": f.Name,
-        })
+        }
+        if is_thin:
+            floor_cands.append(cand)
+        else:
+            thick_floor_cands.append(cand)
 
     for c in ceilings:
         bb = c.get_BoundingBox(None)
-        vbb = _transform_bbox_to_view_local(bb, inv_t) if bb else None
+        if not bb:
+            continue
+        if perm:
+            vbb = _aligned_bbox_to_view_local(bb, perm)
+        else:
+            vbb = _transform_bbox_to_view_local(bb, inv_rows)
         if not vbb:
             continue
-        vmin, vmax = vbb
-        if vmax.X < crop_min.X or vmin.X > crop_max.X:
+        vmin_x, vmin_y, vmin_z, vmax_x, vmax_y, vmax_z = vbb
+        if vmax_x < crop_min.X or vmin_x > crop_max.X:
             continue
-        if vmax.Z < crop_min.Z or vmin.Z > crop_max.Z:
+        if vmax_z < crop_min.Z or vmin_z > crop_max.Z:
             continue
-        thickness = abs(vmax.Y - vmin.Y)
-        cx = (vmin.X + vmax.X) / 2.0
-        cz = (vmin.Z + vmax.Z) / 2.0
-        dist = ((cx - center_x) ** 2 + (cz - center_z) ** 2) ** 0.5
-        all_ceil_cands.append({
-            "bot_y": vmin.Y,
-            "dist": dist,
-            "thickness": thickness,
+        is_thin = abs(vmax_y - vmin_y) <= max_thickness_ft
+        if not is_thin and ceil_cands:
+            continue
+        cx = (vmin_x + vmax_x) / 2.0
+        cz = (vmin_z + vmax_z) / 2.0
+        cand = {
+            "bot_y": vmin_y,
+            "dist_sq": (cx - center_x) ** 2 + (cz - center_z) ** 2,
             "id": c.Id.IntegerValue,
             "name": c.Name,
-        })
+        }
+        if is_thin:
+            ceil_cands.append(cand)
+        else:
+            thick_ceil_cands.append(cand)
 
-    floor_cands = [c for c in all_floor_cands if c["thickness"] <= max_thickness_ft]
-    ceil_cands = [c for c in all_ceil_cands if c["thickness"] <= max_thickness_ft]
     if not floor_cands:
-        floor_cands = all_floor_cands
+        floor_cands = thick_floor_cands
     if not ceil_cands:
-        ceil_cands = all_ceil_cands
+        ceil_cands = thick_ceil_cands
 
     if not floor_cands and not ceil_cands:
         forms.alert("No floor or ceiling bounds found in this view.", exitscript=True)
         return
 
+    # Only the single best of each is needed, so a linear min() stands in for
+    # a full sort.
     # Pick floor closest to view center (then highest if tie).
     best_floor = None
     if floor_cands:
-        floor_cands.sort(key=lambda x: (x["dist"], -x["top_y"]))
-        best_floor = floor_cands[0]
+        best_floor = min(floor_cands, key=lambda x: (x["dist_sq"], -x["top_y"]))
 
     # Pick ceiling closest to view center (then lowest if tie).
     best_ceil = None
     if ceil_cands:
-        ceil_cands.sort(key=lambda x: (x["dist"], x["bot_y"]))
-        best_ceil = ceil_cands[0]
-
-    # If we have a floor, prefer a ceiling above it.
-    if best_floor and ceil_cands:
-        above = [c for c in ceil_cands if c["bot_y"] > best_floor["top_y"] + 1e-6]
-        if above:
-            above.sort(key=lambda x: (x["dist"], x["bot_y"]))
-            best_ceil = above[0]
+        ceil_key = lambda x: (x["dist_sq"], x["bot_y"])
+        best_ceil = min(ceil_cands, key=ceil_key)
+        # If we have a floor, prefer the best ceiling above it.
+        if best_floor:
+            floor_top_y = best_floor["top_y"] + 1e-6
+            above = [c for c in ceil_cands if c["bot_y"] > floor_top_y]
+            if above:
+                best_ceil = min(above, key=ceil_key)
 
     best_floor_y = best_floor["top_y"] if best_floor else None
     best_ceil_y = best_ceil["bot_y"] if best_ceil else None
@@ -253,8 +363,8 @@ def auto_fit_active_view_to_floor_and_ceiling(pad_ft=0.10):
     if best_ceil_y is not None:
         best_ceil_y += pad_ft
 
-    new_min_y = cb.Min.Y if best_floor_y is None else best_floor_y
-    new_max_y = cb.Max.Y if best_ceil_y is None else best_ceil_y
+    new_min_y = crop_min.Y if best_floor_y is None else best_floor_y
+    new_max_y = crop_max.Y if best_ceil_y is None else best_ceil_y
 
     if new_max_y <= new_min_y:
         output.print_md("Computed crop invalid: min {:.3f}, max {:.3f}".format(new_min_y, new_max_y))
@@ -266,13 +376,12 @@ def auto_fit_active_view_to_floor_and_ceiling(pad_ft=0.10):
         forms.alert("Computed crop bounds invalid; no changes applied.", exitscript=True)
         return
 
-    new_cb = DB.BoundingBoxXYZ()
-    new_cb.Transform = cb.Transform
-    new_cb.Min = DB.XYZ(cb.Min.X, new_min_y, cb.Min.Z)
-    new_cb.Max = DB.XYZ(cb.Max.X, new_max_y, cb.Max.Z)
+    # view.CropBox returns a copy; edit it and assign it back.
+    cb.Min = DB.XYZ(crop_min.X, new_min_y, crop_min.Z)
+    cb.Max = DB.XYZ(crop_max.X, new_max_y, crop_max.Z)
 
     with revit.Transaction("Auto-fit elevation to floor/ceiling (temp)"):
-        view.CropBox = new_cb
+        view.CropBox = cb
 
     if best_floor:
         output.print_md("Selected floor: {} (ID {})".format(best_floor["name"], best_floor["id"]))
@@ -282,12 +391,31 @@ def auto_fit_active_view_to_floor_and_ceiling(pad_ft=0.10):
         view.Name, new_min_y, new_max_y))
 
 # --- Main Logic ---
+def _view_name(view_id, cache):
+    # Many notes and tags share an owner view; look each one up only once.
+    key = view_id.IntegerValue
+    if key not in cache:
+        view = doc.GetElement(view_id)
+        cache[key] = view.Name if view else "N/A (View Not Found)"
+    return cache[key]
+
+
+def _display_text(info):
+    if info['type'] == 'Wall Tag':
+        return info['element'].TagText
+    text_content = info['element'].Text.replace('\r\n', ' ').replace('\n', ' ')
+    if len(text_content) > 60:
+        text_content = text_content[:57] + "..."
+    return text_content
+
+
 def find_and_display_elements():
     """
     Finds all TextNote elements with leaders and all Wall Tags,
     and displays them in a markdown table.
     """
     found_elements = []
+    view_names = {}
 
     # 1. Find all TextNotes with leaders
     text_note_collector = DB.FilteredElementCollector(doc)\
@@ -296,44 +424,29 @@ def find_and_display_elements():
 
     for text_note in text_note_collector:
         if text_note.LeaderCount > 0:
-            view = doc.GetElement(text_note.OwnerViewId)
-            view_name = view.Name if view else "N/A (View Not Found)"
-            
-            text_content = text_note.Text.replace('\r\n', ' ').replace('\n', ' ')
-            if len(text_content) > 60:
-                text_content = text_content[:57] + "..."
-
+            # Text is read when the row is printed, not here.
             found_elements.append({
                 'type': 'Text Note',
                 'id': text_note.Id,
-                'text': text_content,
-                'view_name': view_name
+                'element': text_note,
+                'view_name': _view_name(text_note.OwnerViewId, view_names)
             })
 
     # 2. Find all Wall Tags
+    # Class and category are both native filters, so Revit drops every
+    # other kind of tag before it reaches Python.
     tag_collector = DB.FilteredElementCollector(doc)\
                       .OfClass(DB.IndependentTag)\
+                      .OfCategory(DB.BuiltInCategory.OST_WallTags)\
                       .WhereElementIsNotElementType()
 
     for tag in tag_collector:
-        # CORRECTED: Safely check if the tag has the 'TaggedLocalElementId' property
-        # This prevents errors with types like SpanDirectionSymbol
-        if hasattr(tag, 'TaggedLocalElementId'):
-            tagged_element_id = tag.TaggedLocalElementId
-            if tagged_element_id is not None and tagged_element_id != DB.ElementId.InvalidElementId:
-                tagged_element = doc.GetElement(tagged_element_id)
-                # Check if the tagged element is a Wall
-                if tagged_element and tagged_element.Category:
-                    if tagged_element.Category.Id.IntegerValue == int(DB.BuiltInCategory.OST_Walls):
-                        view = doc.GetElement(tag.OwnerViewId)
-                        view_name = view.Name if view else "N/A (View Not Found)"
-                        
-                        found_elements.append({
-                            'type': 'Wall Tag',
-                            'id': tag.Id,
-                            'text': tag.TagText,
-                            'view_name': view_name
-                        })
+        found_elements.append({
+            'type': 'Wall Tag',
+            'id': tag.Id,
+            'element': tag,
+            'view_name': _view_name(tag.OwnerViewId, view_names)
+        })
 
     # Check if any elements were found
     if not found_elements:
@@ -344,25 +457,29 @@ def find_and_display_elements():
     found_elements.sort(key=lambda x: (x['type'], x['view_name']))
 
     # Print the results to the output window in a markdown table
-    output.print_md("### Found Elements ({})".format(len(found_elements)))
-    
-    # Print table header
-    output.print_md("| Type | Element ID | Text / Value | View Name |")
-    output.print_md("|:---|:---|:---|:---|")
-
-    # Print table rows
+    # Heading and table header; rows are added below and it all prints once
+    lines = [
+        "### Found Elements ({})".format(len(found_elements)),
+        "",
+        "| Type | Element ID | Text / Value | View Name |",
+        "|:---|:---|:---|:---|",
+    ]
+
+    # Table rows
     for info in found_elements:
         # output.linkify creates a clickable link that navigates to the element
         element_id_link = output.linkify(info['id'])
         
-        # Format and print the row
-        output.print_md("| {} | {} | {} | {} |".format(
+        # Format the row
+        lines.append("| {} | {} | {} | {} |".format(
             info['type'],
             element_id_link,
-            info['text'],
+            _display_text(info),
             info['view_name']
         ))
 
+    output.print_md("\n".join(lines))
+
 # --- Script Execution ---
 if __name__ == "__main__":
     auto_fit_active_view_to_floor_and_ceiling()
@@ -1,18 +1,39 @@
+import atexit
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List
+from typing import List, Tuple
 
 BASE_DIR = Path(r"T:\architecture archives\Target\03 Projects")
 PROJECT_SUBPATH = Path(r"01_CDS\01_CURRENT\01_REVIT")
 ARCHIVE_SUBPATH = Path(r"01_CDS\02_ARCHIVE")
 OUTPUT_FILE = Path("revit_scan_report.txt")
+MAX_WORKERS = 16
 
-report_lines: List[str] = []
+# The report file gets a large buffer so it doesn't see a write per line.
+_report_fp = open(OUTPUT_FILE, "w", buffering=1 << 16, encoding="utf-8")
+atexit.register(_report_fp.close)
+# Console lines are held here and written through sys.stdout one project at a
+# time, so the console's own encoding handling still applies.
+_console_lines: List[str] = []
+
+
+def flush_console() -> None:
+    """Write the held console lines with a single sys.stdout.write."""
+    if _console_lines:
+        sys.stdout.write("".join(_console_lines))
+        sys.stdout.flush()
+        _console_lines.clear()
+
+
+atexit.register(flush_console)
 
 
 def add_line(line: str = "") -> None:
-    """Append a line to both stdout and the report buffer."""
-    print(line)
-    report_lines.append(line)
+    """Queue a line for the console and write it to the report file buffer."""
+    _console_lines.append(line + "\n")
+    _report_fp.write(line + "\n")
 
 
 def build_archive_tree(root: Path) -> List[str]:
@@ -23,34 +44,79 @@ def build_archive_tree(root: Path) -> List[str]:
 
     lines.append(f"Tree for {root}:")
 
-    def safe_iterdir(directory: Path) -> list[Path]:
+    def safe_scandir(directory: str) -> List[os.DirEntry]:
+        # DirEntry keeps the type info from the directory listing, so the
+        # checks below don't stat every entry again over the network share.
         try:
-            return list(directory.iterdir())
+            with os.scandir(directory) as it:
+                return list(it)
         except PermissionError:
             return []
 
-    def walk(directory: Path, prefix: str = "") -> None:
-        entries: List[Path] = [
-            entry
-            for entry in safe_iterdir(directory)
-            if entry.is_dir() or entry.suffix.lower() == ".rvt"
-        ]
-        entries.sort(key=lambda p: (not p.is_dir(), p.name.lower()))
-        for idx, entry in enumerate(entries):
-            connector = "└──" if idx == len(entries) - 1 else "├──"
-            if entry.is_dir():
-                lines.append(f"{prefix}{connector} {entry.name}/")
-                extension = "    " if idx == len(entries) - 1 else "│   "
-                walk(entry, prefix + extension)
-            else:
-                lines.append(f"{prefix}{connector} {entry}")
-
-    walk(root)
+    def tree_items(directory: str, prefix: str) -> list:
+        """(prefix, connector, is_file, entry, child_prefix) per listed entry."""
+        entries = []
+        for entry in safe_scandir(directory):
+            is_dir = entry.is_dir()
+            if is_dir or entry.name.lower().endswith(".rvt"):
+                entries.append((not is_dir, entry.name.lower(), entry))
+        entries.sort(key=lambda e: e[:2])
+        items = []
+        for idx, (is_file, _, entry) in enumerate(entries):
+            is_last = idx == len(entries) - 1
+            connector = "└──" if is_last else "├──"
+            extension = "    " if is_last else "│   "
+            items.append((prefix, connector, is_file, entry, prefix + extension))
+        return items
+
+    # Depth-first with an explicit stack instead of recursion; children are
+    # pushed in reverse so they pop in listing order.
+    stack = tree_items(str(root), "")[::-1]
+    while stack:
+        prefix, connector, is_file, entry, child_prefix = stack.pop()
+        if is_file:
+            lines.append(f"{prefix}{connector} {entry.path}")
+        else:
+            lines.append(f"{prefix}{connector} {entry.name}/")
+            stack.extend(reversed(tree_items(entry.path, child_prefix)))
+
     if len(lines) == 1:
         lines.append("  (no folders or .rvt files found)")
     return lines
 
 
+def scan_project(year: int, project_dir: Path) -> Tuple[List[str], int]:
+    """Return the report lines for one project and its 01_REVIT .rvt count."""
+    lines: List[str] = [f"{year} | {project_dir.name}"]
+    target_dir = project_dir / PROJECT_SUBPATH
+    rvt_files: List[str] = []
+    try:
+        # One listing, filtered by name; no exists() probe or per-file stat.
+        with os.scandir(target_dir) as it:
+            rvt_files = [
+                entry.path
+                for entry in sorted(it, key=lambda e: e.name.lower())
+                if entry.name.lower().endswith(".rvt")
+            ]
+    except (FileNotFoundError, NotADirectoryError):
+        lines.append(f"  Current folder missing -> {target_dir}")
+    except OSError:
+        # e.g. PermissionError on a locked folder; report it and move on
+        lines.append(f"  Current folder unreadable -> {target_dir}")
+
+    if rvt_files:
+        lines.append(f"  Found {len(rvt_files)} .rvt file(s) within {target_dir}")
+        for file in rvt_files:
+            lines.append(f"    - {file}")
+    else:
+        lines.append(f"  No .rvt files in {target_dir}")
+        archive_dir = project_dir / ARCHIVE_SUBPATH
+        lines.append(f"  Checking archive -> {archive_dir}")
+        for tree_line in build_archive_tree(archive_dir):
+            lines.append(f"    {tree_line}")
+    return lines, len(rvt_files)
+
+
 years_scanned = 0
 year_dirs_missing = 0
 projects_checked = 0
@@ -60,46 +126,42 @@ total_rvt_files = 0
 add_line("Revit scan")
 add_line("==============================")
 
-for year in range(2022, 2026):
-    year_dir = BASE_DIR / str(year)
-    add_line(f"\nYear {year}")
-    add_line("-" * 40)
-    if not year_dir.exists():
-        add_line(f"{year}: year directory not found -> {year_dir}")
-        year_dirs_missing += 1
-        continue
-
-    years_scanned += 1
-    project_dirs = sorted(p for p in year_dir.iterdir() if p.is_dir())
-    if not project_dirs:
-        add_line(f"{year}: no project folders inside {year_dir}")
-        continue
-
-    for project_dir in project_dirs:
-        projects_checked += 1
-        label = f"{year} | {project_dir.name}"
-        add_line(f"{label}")
-        target_dir = project_dir / PROJECT_SUBPATH
-        rvt_files: List[Path] = []
-        if not target_dir.exists():
-            add_line(f"  Current folder missing -> {target_dir}")
-        else:
-            rvt_files = sorted(target_dir.glob("*.rvt"), key=lambda p: p.name.lower())
-
-        if rvt_files:
-            projects_with_rvt += 1
-            total_rvt_files += len(rvt_files)
-            add_line(
-                f"  Found {len(rvt_files)} .rvt file(s) within {target_dir}"
-            )
-            for file in rvt_files:
-                add_line(f"    - {file}")
-        else:
-            add_line(f"  No .rvt files in {target_dir}")
-            archive_dir = project_dir / ARCHIVE_SUBPATH
-            add_line(f"  Checking archive -> {archive_dir}")
-            for tree_line in build_archive_tree(archive_dir):
-                add_line(f"    {tree_line}")
+# The scan is bound by share latency, not CPU, so projects are scanned on a
+# thread pool. Workers only return lines; everything is printed here, in order.
+with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+    year_scans = []
+    for year in range(2022, 2026):
+        year_dir = BASE_DIR / str(year)
+        header = [f"\nYear {year}", "-" * 40]
+        futures = []
+        year_scans.append((header, futures))
+        if not year_dir.exists():
+            header.append(f"{year}: year directory not found -> {year_dir}")
+            year_dirs_missing += 1
+            continue
+
+        years_scanned += 1
+        with os.scandir(year_dir) as it:
+            project_dirs = sorted(Path(e.path) for e in it if e.is_dir())
+        if not project_dirs:
+            header.append(f"{year}: no project folders inside {year_dir}")
+            continue
+
+        for project_dir in project_dirs:
+            futures.append(pool.submit(scan_project, year, project_dir))
+
+    for header, futures in year_scans:
+        for line in header:
+            add_line(line)
+        for future in futures:
+            lines, rvt_count = future.result()
+            projects_checked += 1
+            if rvt_count:
+                projects_with_rvt += 1
+                total_rvt_files += rvt_count
+            for line in lines:
+                add_line(line)
+            flush_console()
 
 add_line("\nTotals")
 add_line("------")
@@ -109,5 +171,6 @@ add_line(f"Projects checked: {projects_checked}")
 add_line(f"Projects with .rvt files: {projects_with_rvt}")
 add_line(f"Total .rvt files found (01_REVIT only): {total_rvt_files}")
 
-OUTPUT_FILE.write_text("\n".join(report_lines) + "\n", encoding="utf-8")
+_report_fp.close()
+flush_console()
 print(f"\nReport saved to {OUTPUT_FILE.resolve()}")
@@ -1,61 +1,92 @@
 from datetime import datetime
+from functools import lru_cache
 import os
 from openai import OpenAI
 import logger
 from dotenv import load_dotenv
 
 load_dotenv()
+SYSTEM_PROMPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "system.txt")
+# Last read of system.txt and the mtime it was read at; shared by every AI().
+_system_prompt_cache = {"mtime_ns": None, "prompt": None}
+
 model_config = {
     "moneyhog": {
         "model": "google/gemini-2.5-flash-preview-05-20",
-        "client": OpenAI(base_url="https://openrouter.ai/api/v1"),
+        "base_url": "https://openrouter.ai/api/v1",
         "key": "OPENROUTER_API_KEY",
     },
     "openai": {
         "model": "gpt-4.1-2025-04-14",
-        "client": OpenAI(),
+        "base_url": None,
         "key": "OPENAI_API_KEY",
     },
 }
 
 
+@lru_cache(maxsize=None)
+def get_client(name):
+    """One client per provider, so every request shares its connection pool."""
+    config = model_config[name]
+    return OpenAI(api_key=os.getenv(config["key"]), base_url=config["base_url"])
+
+
 class AI:
     def __init__(self):
-        self.system_prompt = self.get_system_prompt()
-        self.config = model_config["moneyhog"]
+        self.provider = "moneyhog"
+        self.config = model_config[self.provider]
         self.model = self.config["model"]
-        self.client = self.config["client"]
-        self.client.api_key = os.getenv(self.config["key"])
+        self.client = get_client(self.provider)
         # self.model = "gpt-4.1-2025-04-14"
         # self.model = "gpt-4.1-mini-2025-04-14"
 
+    @property
+    def system_prompt(self):
+        # Read on use, so a long-lived AI still picks up edits to system.txt.
+        return self.get_system_prompt()
+
     def get_system_prompt(self):
+        # Only re-read the file when it has been edited since the last read.
         try:
-            system_file_path = os.path.join(
-                os.path.dirname(os.path.abspath(__file__)), "system.txt"
-            )
-            with open(system_file_path, "r") as f:
-                return f.read().strip()
+            mtime_ns = os.stat(SYSTEM_PROMPT_PATH).st_mtime_ns
+            if mtime_ns != _system_prompt_cache["mtime_ns"]:
+                with open(SYSTEM_PROMPT_PATH, "r") as f:
+                    _system_prompt_cache["prompt"] = f.read().strip()
+                _system_prompt_cache["mtime_ns"] = mtime_ns
+            return _system_prompt_cache["prompt"]
         except Exception as e:
             raise e
 
     def generate_code(self, query):
-        try:
-            # Update the system prompt then get the response
-            self.system_prompt = self.get_system_prompt()
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": self.system_prompt},
-                    {"role": "user", "content": query},
-                ],
-                max_tokens=3000,
-            )
-            print(response)
-            generated_code = response.choices[0].message.content
-            return generated_code
-        except Exception as e:
-            return e
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": self.system_prompt},
+                {"role": "user", "content": query},
+            ],
+            max_tokens=3000,
+        )
+        print(response)
+        generated_code = response.choices[0].message.content
+        return generated_code
+
+    def stream_code(self, query):
+        """Yields the completion text piece by piece as the model produces it."""
+        stream = self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": self.system_prompt},
+                {"role": "user", "content": query},
+            ],
+            max_tokens=3000,
+            stream=True,
+        )
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            text = chunk.choices[0].delta.content
+            if text:
+                yield text
 
 
 if __name__ == "__main__":
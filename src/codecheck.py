@@ -1,3 +1,4 @@
+import re
 import subprocess
 import tempfile
 import os
@@ -18,6 +19,19 @@ import os
 # ipy_path = r"C:\path\to\your\IronPython.2.7.12\net45\ipy.exe"
 
 
+# Body of a fenced block, up to its closing fence or the end of the text.
+# A ```python (or ```python3) block wins over any other, since its code is
+# what gets run; otherwise the first fence is used. A language tag is only
+# dropped when nothing but blanks follow it on the fence line (CRLF or LF),
+# so "```print(1)```" keeps its code.
+_PYTHON_FENCE_RE = re.compile(
+    r"```python3?[ \t]*(?:\r?\n|\Z)(.*?)(?:```|\Z)", re.DOTALL
+)
+_FENCE_RE = re.compile(
+    r"```(?:[\w+\-.#]+(?=[ \t]*\r?\n))?[ \t]*\r?\n?(.*?)(?:```|\Z)", re.DOTALL
+)
+
+
 def clean_code(code_string):
     """
     Args:
@@ -29,41 +43,10 @@ def clean_code(code_string):
              If no block is extracted, returns the original string stripped
              of leading/trailing whitespace.
     """
-    s = code_string
-
-    python_marker = "```python"
-    py_marker_idx = s.find(python_marker)
-    block_marker = "```"
-
-    if py_marker_idx != -1:
-        code_start_offset = len(python_marker)
-        if (py_marker_idx + code_start_offset < len(s)) and (
-            s[py_marker_idx + code_start_offset] == "\n"
-        ):
-            code_start_offset += 1
-        actual_code_start_index = py_marker_idx + code_start_offset
-        closing_marker_idx = s.find(block_marker, actual_code_start_index)
-
-        if closing_marker_idx != -1:
-            return s[actual_code_start_index:closing_marker_idx].strip()
-        else:
-            return s[actual_code_start_index:].strip()
-
-    generic_marker_idx = s.find(block_marker)
-    if generic_marker_idx != -1:
-        code_start_offset = len(block_marker)
-        if (generic_marker_idx + code_start_offset < len(s)) and (
-            s[generic_marker_idx + code_start_offset] == "\n"
-        ):
-            code_start_offset += 1
-        actual_code_start_index = generic_marker_idx + code_start_offset
-        closing_marker_idx = s.find(block_marker, actual_code_start_index)
-
-        if closing_marker_idx != -1:
-            return s[actual_code_start_index:closing_marker_idx].strip()
-        else:
-            return s[actual_code_start_index:].strip()
-    return s.strip()
+    match = _PYTHON_FENCE_RE.search(code_string) or _FENCE_RE.search(code_string)
+    if match:
+        return match.group(1).strip()
+    return code_string.strip()
 
 
 def check_syntax(code_str):
@@ -1,52 +1,214 @@
+import atexit
 import json
 import os
+import queue
+import threading
+import time
+import traceback
 from datetime import datetime
 
+# orjson parses and serializes several times faster; plain json still works.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
-LOG_FILE = os.path.join(LOG_DIR, "events.json")
+# One JSON object per line, so logging an event is a single append.
+LOG_FILE = os.path.join(LOG_DIR, "events.jsonl")
+# Events written before the switch to JSON Lines; read-only now.
+LEGACY_LOG_FILE = os.path.join(LOG_DIR, "events.json")
+
+os.makedirs(LOG_DIR, exist_ok=True)
+
+
+def loads(data):
+    """Parses JSON from str or bytes."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj, indent=False):
+    """Serializes obj to UTF-8 JSON bytes, compact unless indent is set."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    if indent:
+        return json.dumps(obj, indent=4).encode("utf-8")
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+# Events are serialized by the caller and handed to a single writer thread as
+# ready-to-append lines, so requests never wait on disk.
+MAX_PENDING_EVENTS = 10000
+BATCH_SIZE = 256
+# Longest get_logs waits for the writer before reading what is on disk.
+READ_WAIT_SECONDS = 1.0
+_pending = queue.Queue(maxsize=MAX_PENDING_EVENTS)
+# Guards _queued_count and dropped_events, which request threads update.
+_queue_lock = threading.Lock()
+# Lines queued so far, and lines the writer has finished with; get_logs waits
+# for the second to catch up with the first as it was when it was called.
+_queued_count = 0
+_written_count = 0
+_written = threading.Condition()
+# Events dropped because the writer fell MAX_PENDING_EVENTS behind.
+dropped_events = 0
+
+
+def _write_batches():
+    """Writer thread: appends queued lines, up to BATCH_SIZE per write."""
+    global _written_count
+    while True:
+        batch = [_pending.get()]
+        while len(batch) < BATCH_SIZE:
+            try:
+                batch.append(_pending.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            with open(LOG_FILE, "ab") as f:
+                f.write(b"".join(batch))
+        except Exception:
+            traceback.print_exc()
+        finally:
+            with _written:
+                _written_count += len(batch)
+                _written.notify_all()
+            for _ in batch:
+                _pending.task_done()
+
+
+threading.Thread(target=_write_batches, name="log-writer", daemon=True).start()
+# Don't lose queued events on a clean shutdown.
+atexit.register(_pending.join)
+
+
+# (second, "YYYY-MM-DDTHH:MM:SS") of the last timestamp made; swapped as one
+# tuple so threads logging at once never pair a second with another's prefix.
+_last_second = (None, "")
+
+
+def _timestamp():
+    """UTC ISO timestamp with microseconds, formatting each second only once."""
+    global _last_second
+    sec, ns = divmod(time.time_ns(), 1_000_000_000)
+    cached_sec, prefix = _last_second
+    if sec != cached_sec:
+        prefix = datetime.utcfromtimestamp(sec).strftime("%Y-%m-%dT%H:%M:%S")
+        _last_second = (sec, prefix)
+    return "%s.%06d" % (prefix, ns // 1000)
 
 
 def log_event(log_type, data):
     """
     Logs an event of the specified type with the given data.
+    Raises whatever the JSON encoder raises if data can't be serialized.
     Args:
         log_type (str): The type of event (e.g., "ai", "error", etc.).
         data (dict): A dictionary of data to log.
     """
     log_entry = {
-        "timestamp": datetime.utcnow().isoformat(),
+        "timestamp": _timestamp(),
         "log_type": log_type,
         "data": data,
     }
-    os.makedirs(LOG_DIR, exist_ok=True)
-    logs = []
-    if os.path.exists(LOG_FILE):
+    # Serialized here, so a bad entry fails its caller rather than the batch
+    line = dumps(log_entry) + b"\n"
+    global dropped_events, _queued_count
+    with _queue_lock:
         try:
-            with open(LOG_FILE, "r") as f:
-                logs = json.load(f)
-        except json.JSONDecodeError:
-            #TODO
-            return
-    logs.append(log_entry)
-    with open(LOG_FILE, "w") as f:
-        json.dump(logs, f, indent=4)
+            _pending.put_nowait(line)
+            _queued_count += 1
+        except queue.Full:
+            dropped_events += 1
+
+
+def _read_legacy_logs():
+    """Returns the events in the pre-JSON Lines log, oldest first."""
+    if not os.path.exists(LEGACY_LOG_FILE):
+        return []
+    try:
+        with open(LEGACY_LOG_FILE, "rb") as f:
+            return loads(f.read())
+    except json.JSONDecodeError:
+        return []
+
+
+def _read_log_lines(offset):
+    """
+    Parses the complete lines of LOG_FILE from byte offset onwards.
+    Returns:
+        tuple: (events, offset just past the last complete line)
+    """
+    logs = []
+    try:
+        with open(LOG_FILE, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Not finished yet; picked up by a later call
+                    break
+                offset += len(line)
+                try:
+                    logs.append(loads(line))
+                except json.JSONDecodeError:
+                    # e.g. a line cut short by a crash mid-write
+                    continue
+    except FileNotFoundError:
+        pass
+    return logs, offset
+
+
+def _file_key(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+# Parsed logs, grouped by type. LOG_FILE is only appended to, so after the
+# first read only the bytes past "offset" need parsing.
+_logs_cache = {"legacy_key": None, "offset": 0, "all": [], "by_type": {}}
+_logs_lock = threading.Lock()
+
+
+def _add_logs(logs):
+    _logs_cache["all"].extend(logs)
+    for log in logs:
+        _logs_cache["by_type"].setdefault(log["log_type"], []).append(log)
 
 
 def get_logs(log_type=None):
     """
     Retrieves logged events, optionally filtered by type.
+    Only events appended since the last call are parsed.
     Args:
         log_type (str, optional): If provided, only returns logs of this type.
     Returns:
         list: List of log entries.
     """
-    if not os.path.exists(LOG_FILE):
-        return []
-    try:
-        with open(LOG_FILE, "r") as f:
-            logs = json.load(f)
-            if log_type:
-                return [log for log in logs if log["log_type"] == log_type]
-            return logs
-    except json.JSONDecodeError:
-        return []
+    # Give the writer a moment to finish what was logged before this call,
+    # without waiting on events other threads log in the meantime.
+    with _queue_lock:
+        target = _queued_count
+    with _written:
+        _written.wait_for(lambda: _written_count >= target, READ_WAIT_SECONDS)
+    with _logs_lock:
+        legacy_key = _file_key(LEGACY_LOG_FILE)
+        log_key = _file_key(LOG_FILE)
+        size = log_key[1] if log_key else 0
+        # Start over if the legacy file changed or the log was truncated/replaced
+        if legacy_key != _logs_cache["legacy_key"] or size < _logs_cache["offset"]:
+            _logs_cache["legacy_key"] = legacy_key
+            _logs_cache["offset"] = 0
+            _logs_cache["all"] = []
+            _logs_cache["by_type"] = {}
+            _add_logs(_read_legacy_logs())
+        if size > _logs_cache["offset"]:
+            logs, _logs_cache["offset"] = _read_log_lines(_logs_cache["offset"])
+            _add_logs(logs)
+        # Copies, so callers can't change the cached lists
+        if log_type:
+            return list(_logs_cache["by_type"].get(log_type, []))
+        return list(_logs_cache["all"])
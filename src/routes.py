@@ -1,5 +1,12 @@
 import time
-from flask import Blueprint, request, jsonify, render_template_string
+from flask import (
+    Blueprint,
+    Response,
+    current_app,
+    request,
+    jsonify,
+    stream_with_context,
+)
 import openai
 import os
 import json
@@ -9,50 +16,122 @@ from datetime import datetime
 import logger
 from ai import AI
 from codecheck import clean_code
+from working import get_working, set_working
 
 load_dotenv("../.env")
 routes = Blueprint("routes", __name__)
 
+# Answer every generate_code with DEMO_CODE instead of calling the model.
+# Read once at import; restart the server after changing it.
+DEMO_MODE = os.getenv("DEMO_MODE", "false").lower() == "true"
+DEMO_CODE = "from pyrevit import revit, DB, forms\nforms.alert('hello world!')"
+
+# Shared by every request; AI holds no per-request state.
+_ai_instance = None
+
+
+def _ai():
+    global _ai_instance
+    if _ai_instance is None:
+        _ai_instance = AI()
+    return _ai_instance
+
+
+def log_error(user_input, model, e):
+    """
+    Logs an exception raised while answering user_input. The traceback is
+    kept as (filename, lineno, function) frames rather than formatted text.
+    """
+    logger.log_event(
+        "error",
+        {
+            "query": user_input,
+            "model": model,
+            "type": type(e).__name__,
+            "msg": str(e),
+            "frames": [
+                (f.filename, f.lineno, f.name)
+                for f in traceback.extract_tb(e.__traceback__)
+            ],
+        },
+    )
+
+
+def _sse(payload):
+    return "data: " + json.dumps(payload) + "\n\n"
+
+
+def stream_generated_code(ai_instance, user_input):
+    """
+    Sends the completion as server-sent events while the model is still
+    writing it: {"t": text} per piece, then {"done": true, "code": ...} with
+    the cleaned code once finished,
+    or {"error": ...} if the model call fails part way through.
+    """
+
+    def gen():
+        parts = []
+        try:
+            for text in ai_instance.stream_code(user_input):
+                parts.append(text)
+                yield _sse({"t": text})
+        except Exception as e:
+            log_error(user_input, ai_instance.model, e)
+            yield _sse({"error": traceback.format_exc()})
+            return
+
+        code = clean_code("".join(parts))
+        logger.log_event(
+            "ai",
+            {
+                "query": user_input,
+                "code": code,
+                "model": ai_instance.model,
+            },
+        )
+        yield _sse({"done": True, "code": code})
+
+    return Response(
+        stream_with_context(gen()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
 @routes.route("/generate_code", methods=["POST", "GET"])
 def generate_code(user_input=None):
 
     if request.method == "GET":
         user_input = request.args.get("input")
+        stream = request.args.get("stream", "").lower() in ("1", "true")
     else:
-        user_input = request.json.get("input") if request.is_json else None
+        body = request.json if request.is_json else {}
+        user_input = body.get("input")
+        stream = bool(body.get("stream"))
 
     if not user_input:
         return jsonify({"error": "No input provided"}), 400
 
     # Bypass creating a new response if in cheap mode
-    print(os.getenv("DEMO_MODE"))
-    if os.getenv("DEMO_MODE", "false").lower() == "true":
-        return (
-            jsonify(
-                {
-                    "code": "from pyrevit import revit, DB, forms\nforms.alert('hello world!')"
-                }
-            ),
-            200,
-        )
+    if DEMO_MODE:
+        return jsonify({"code": DEMO_CODE}), 200
         # return clean_code(logger.get_logs("ai")[0]["data"].get("code", ""))
 
     timestamp = datetime.utcnow().isoformat()
-    ai_instance = AI()
+    ai_instance = _ai()
+
+    if stream:
+        return stream_generated_code(ai_instance, user_input)
 
     try:
         # generated_code = 'from revit import ur_mom\nprint("deez nuts")'
+        # Raises on API errors, handled below
         generated_code = ai_instance.generate_code(user_input)
 
-        # When there may be an error
-        if type(generated_code) == Exception:
-            return jsonify({"error": str(generated_code)}), 500
-
-        # Attempt to clean the code
+        # Attempt to clean the code; the streamed path does the same, so
+        # both log and return identical code for the same completion
         #TODO: add iron python 
-        # checked_code = clean_code(generated_code)
-        checked_code = generate_code
+        checked_code = clean_code(generated_code)
 
         logger.log_event(
             "ai",
@@ -67,17 +146,75 @@ def generate_code(user_input=None):
         return jsonify({"code": checked_code}), 200
 
     except Exception as e:
-        full_error = traceback.format_exc()
-        error_message = str(e)
-        logger.log_event(
-            "error",
-            {
-                "query": user_input,
-                "error": full_error,
-                "model": ai_instance.model,
+        log_error(user_input, ai_instance.model, e)
+        return jsonify({"error": traceback.format_exc()}), 500
+
+
+# A simple HTML page with code blocks and checkboxes
+HOME_HTML = """
+<html>
+  <head>
+    <title>AI Events</title>
+    <style>
+        body {
+            font-family: Cambria;
+            max-width: 50%;
+            margin: auto;
+        }
+      pre {
+        background-color: #f4f4f4;
+        padding: 10px;
+      }
+    </style>
+  </head>
+  <body>
+    <h1>AI Events</h1>
+    {% for event in ai_logs %}
+      <div>
+        <h3>Query: {{ event.data.query }}</h3>
+        <h3>Model: {{ event.data.model }}</h3>
+        <h3>Event at {{ event.timestamp }}</h3>
+        <pre><code>{{ event.data.code }}</code></pre>
+        <label>
+          <input type="checkbox" class="working-checkbox" 
+                 data-timestamp="{{ event.timestamp }}" 
+                 data-query="{{ event.data.query }}"
+                 {% if working_data.get(event.timestamp) %} checked {% endif %}>
+          Working
+        </label>
+      </div>
+      <hr>
+    {% endfor %}
+    <script>
+      document.querySelectorAll('.working-checkbox').forEach(function(checkbox) {
+        checkbox.addEventListener('change', function() {
+          const timestamp = this.getAttribute('data-timestamp');
+          const query = this.getAttribute('data-query');
+          const working = this.checked;
+          fetch('/update_working', {
+            method: 'POST',
+            headers: {
+              'Content-Type': 'application/json'
             },
-        )
-        return jsonify({"error": full_error}), 500
+            body: JSON.stringify({timestamp: timestamp, query: query, working: working})
+          })
+          .then(response => response.json())
+          .then(data => console.log(data));
+        });
+      });
+    </script>
+  </body>
+</html>
+"""
+# HOME_HTML compiled by the app's Jinja environment, so it is only parsed once
+_home_template_cache = {}
+
+
+def _home_template():
+    env = current_app.jinja_env
+    if env not in _home_template_cache:
+        _home_template_cache[env] = env.from_string(HOME_HTML)
+    return _home_template_cache[env]
 
 
 @routes.route("/", methods=["GET"])
@@ -85,80 +222,17 @@ def home():
     # Load all ai events
     ai_logs = logger.get_logs("ai")[::-1]
 
-    # Load the working data as a list then convert to a dict keyed by timestamp
-    working_path = os.path.join(
-        os.path.dirname(os.path.abspath(__file__)), "data", "working.json"
+    # Working flags keyed by timestamp
+    working_data = get_working()
+
+    # Sent event by event as the template renders, so the page starts
+    # arriving before the whole log has been turned into HTML
+    return Response(
+        stream_with_context(
+            _home_template().generate(ai_logs=ai_logs, working_data=working_data)
+        ),
+        mimetype="text/html",
     )
-    if os.path.exists(working_path):
-        try:
-            with open(working_path, "r") as f:
-                working_list = json.load(f)
-            # Create dict mapping timestamp to working value
-            working_data = {
-                entry["timestamp"]: entry["working"] for entry in working_list
-            }
-        except json.JSONDecodeError:
-            working_data = {}
-    else:
-        working_data = {}
-
-    # Render a simple HTML page with code blocks and checkboxes
-    html = """
-    <html>
-      <head>
-        <title>AI Events</title>
-        <style>
-            body {
-                font-family: Cambria;
-                max-width: 50%;
-                margin: auto;
-            }
-          pre {
-            background-color: #f4f4f4;
-            padding: 10px;
-          }
-        </style>
-      </head>
-      <body>
-        <h1>AI Events</h1>
-        {% for event in ai_logs %}
-          <div>
-            <h3>Query: {{ event.data.query }}</h3>
-            <h3>Model: {{ event.data.model }}</h3>
-            <h3>Event at {{ event.timestamp }}</h3>
-            <pre><code>{{ event.data.code }}</code></pre>
-            <label>
-              <input type="checkbox" class="working-checkbox" 
-                     data-timestamp="{{ event.timestamp }}" 
-                     data-query="{{ event.data.query }}"
-                     {% if working_data.get(event.timestamp) %} checked {% endif %}>
-              Working
-            </label>
-          </div>
-          <hr>
-        {% endfor %}
-        <script>
-          document.querySelectorAll('.working-checkbox').forEach(function(checkbox) {
-            checkbox.addEventListener('change', function() {
-              const timestamp = this.getAttribute('data-timestamp');
-              const query = this.getAttribute('data-query');
-              const working = this.checked;
-              fetch('/update_working', {
-                method: 'POST',
-                headers: {
-                  'Content-Type': 'application/json'
-                },
-                body: JSON.stringify({timestamp: timestamp, query: query, working: working})
-              })
-              .then(response => response.json())
-              .then(data => console.log(data));
-            });
-          });
-        </script>
-      </body>
-    </html>
-    """
-    return render_template_string(html, ai_logs=ai_logs, working_data=working_data)
 
 
 @routes.route("/update_working", methods=["POST"])
@@ -167,40 +241,12 @@ def update_working():
     timestamp = data.get("timestamp")
     query = data.get("query")
     working = data.get("working")
-    working_path = os.path.join(
-        os.path.dirname(os.path.abspath(__file__)), "data", "working.json"
-    )
-
-    if os.path.exists(working_path):
-        with open(working_path, "r") as f:
-            try:
-                working_data = json.load(f)
-                if not isinstance(working_data, list):
-                    working_data = []
-            except json.JSONDecodeError:
-                working_data = []
-    else:
-        working_data = []
-
-    # Check if a record with the same timestamp already exists. Update if found.
-    updated = False
-    for record in working_data:
-        if record.get("timestamp") == timestamp:
-            record["working"] = working
-            record["query"] = query
-            updated = True
-            break
-
-    if not updated:
-        working_data.append(
-            {"working": working, "timestamp": timestamp, "query": query}
-        )
+    if not timestamp:
+        return jsonify({"error": "No timestamp provided"}), 400
 
-    os.makedirs(os.path.dirname(working_path), exist_ok=True)
-    with open(working_path, "w") as f:
-        json.dump(working_data, f, indent=4)
+    set_working(timestamp, query, working)
 
-    return jsonify(working_data), 200
+    return jsonify({"timestamp": timestamp, "query": query, "working": working}), 200
 
 
 if __name__ == "__main__":
@@ -1,15 +1,25 @@
 from flask import Flask
 from routes import routes
 
+# Optional: gzip/brotli responses, mostly for the home page's code blocks.
+try:
+    from flask_compress import Compress
+except ImportError:
+    Compress = None
+
 
 def create_app():
     app = Flask(__name__)
     app.register_blueprint(routes)
+    if Compress is not None:
+        Compress(app)
     return app
 
 
 if __name__ == "__main__":
     app = create_app()
-    app.run(debug=True)
+    # threaded=True is already Flask's default; it is spelled out because
+    # the logger and working flags are written from several request threads.
+    app.run(debug=True, threaded=True)
     app_context = app.app_context()
     app_context.push()
\ No newline at end of file
@@ -0,0 +1,33 @@
+from codecheck import clean_code
+
+
+def test_python_block_wins_over_earlier_fence():
+    text = "```bash\npip x\n``` then ```python\nprint(2)\n```"
+    assert clean_code(text) == "print(2)"
+
+
+def test_python3_tag_is_dropped():
+    assert clean_code("```python3\nprint(1)\n```") == "print(1)"
+
+
+def test_crlf_fence():
+    assert clean_code("```python\r\nprint(1)\r\n```") == "print(1)"
+    assert clean_code("```bash\r\npip x\r\n```") == "pip x"
+
+
+def test_trailing_blanks_after_tag():
+    assert clean_code("```python \nprint(1)\n```") == "print(1)"
+    assert clean_code("```bash\t\npip x\n```") == "pip x"
+
+
+def test_unterminated_fence():
+    assert clean_code("```python") == ""
+    assert clean_code("```python\nprint(1)") == "print(1)"
+
+
+def test_inline_fence_keeps_code():
+    assert clean_code("```print(1)```") == "print(1)"
+
+
+def test_no_fence():
+    assert clean_code("  print(1)\n") == "print(1)"
@@ -0,0 +1,86 @@
+import os
+import sqlite3
+import threading
+
+import logger
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+# One row per AI event, keyed by the event's timestamp.
+DB_FILE = os.path.join(DATA_DIR, "working.db")
+# Flags saved before the switch to sqlite; imported once, then left alone.
+LEGACY_WORKING_FILE = os.path.join(DATA_DIR, "working.json")
+
+os.makedirs(DATA_DIR, exist_ok=True)
+
+# Autocommit; each statement is its own transaction.
+_conn = sqlite3.connect(DB_FILE, isolation_level=None, check_same_thread=False)
+_conn.execute("PRAGMA journal_mode=WAL")
+# Flask serves requests on several threads, which share the one connection.
+_lock = threading.Lock()
+# In-memory copy of the table, loaded on first use and kept in step by
+# set_working, so rendering the home page never queries the database.
+_flags = None
+
+
+def _import_legacy(conn):
+    """Copies the records from working.json into a freshly created table."""
+    if not os.path.exists(LEGACY_WORKING_FILE):
+        return
+    try:
+        with open(LEGACY_WORKING_FILE, "rb") as f:
+            records = logger.loads(f.read())
+    except ValueError:
+        return
+    if not isinstance(records, list):
+        return
+    conn.executemany(
+        "INSERT OR REPLACE INTO working(ts, query, working) VALUES (?, ?, ?)",
+        [
+            (r.get("timestamp"), r.get("query"), bool(r.get("working")))
+            for r in records
+            if isinstance(r, dict) and r.get("timestamp")
+        ],
+    )
+
+
+with _lock:
+    _exists = _conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='working'"
+    ).fetchone()
+    if not _exists:
+        _conn.execute("BEGIN")
+        _conn.execute(
+            "CREATE TABLE working(ts TEXT PRIMARY KEY, query TEXT, working INTEGER)"
+        )
+        _import_legacy(_conn)
+        _conn.execute("COMMIT")
+
+
+def get_working():
+    """
+    Returns:
+        dict: Maps each event timestamp to whether its code was marked working.
+    """
+    global _flags
+    with _lock:
+        if _flags is None:
+            rows = _conn.execute("SELECT ts, working FROM working").fetchall()
+            _flags = {ts: bool(working) for ts, working in rows}
+        return dict(_flags)
+
+
+def set_working(timestamp, query, working):
+    """
+    Records whether the code from the event at timestamp worked.
+    Args:
+        timestamp (str): Timestamp of the AI event.
+        query (str): The query that produced the code.
+        working (bool): Whether the code worked.
+    """
+    with _lock:
+        _conn.execute(
+            "INSERT OR REPLACE INTO working(ts, query, working) VALUES (?, ?, ?)",
+            (timestamp, query, bool(working)),
+        )
+        if _flags is not None:
+            _flags[timestamp] = bool(working)